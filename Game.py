@@ -7,8 +7,22 @@ To make more ppm files, open a gif or jpg in xv and save as ppm raw.
 Put the three ADTs in their own files.
 """
 
-from gameboard import *
-from random import *
+import os
+import pickle
+import random
+import tempfile
+from array import array
+
+# What a cell of a room holds. Every item has one of these as its kind, so
+# code can tell items apart with an int compare instead of str(item).
+EMPTY_KIND = 0
+PART_KIND = 1
+PORTAL_KIND = 2
+SHIP_COMPONENT_KIND = 3
+
+# Image name -> kind of the items that show it, filled in as rooms index
+# their items. An image always belongs to one kind of item.
+IMAGE_KINDS = {}
 
 
 class Game:
@@ -16,19 +30,53 @@ class Game:
 
     Can get and set position as well as change the position 
 
+    A headless game has no gameboard and never imports Tk, so it can be
+    driven with tick() on machines without a display. The gameboard draws
+    with the given graphics backend module (graphics by default), and with
+    composite_map it draws the map as a single image. Rooms are made with
+    room_type, Room or anything that works like it, e.g. gridroom.GridRoom.
+
+    Everything random comes from the game's own generator, so the same
+    seed plays out the same world. Each room is described by a seed of
+    its own: a portal only knows the seed of the room it leads to, and
+    the room is generated from it when the rover first steps through.
+    Rooms the rover leaves without changing them are dropped, and made
+    again from their seed if it comes back. Changed rooms are kept in a
+    RoomStore, which holds at most max_rooms of them in memory and writes
+    the rest to disk, so memory stays flat however far the rover goes.
+
     Attributes:
-        self.gui: The gameboard with the given size
+        self.gui: The gameboard with the given size (None if headless)
         self.rover: The rover object
         self.room: The room with the given size
+        self.room_type: The class used to make rooms
+        self.rng: The random.Random all of the game's randomness comes from
+        self.room_seed: The seed of the current room
+        self.rooms: RoomStore of the current room and every room that has
+            been changed, by seed
+        self.portal_stack: Seeds of the rooms left through portals, the
+            one the way back leads to on top
     """
     SIZE = 15 # rooms are 15x15
     STEP_COUNT = 120
-    def __init__(self):
+    def __init__(self, headless=False, backend=None, composite_map=False,
+                 room_type=None, seed=None, max_rooms=None):
         # Creates the gameboard, rover, and room with the given size
-        self.gui = GameBoard("Lost Rover", self, Game.SIZE)
-        self.rover = Rover()
-        self.room = Room(Game.SIZE)
-        self.inventory = LinkedList()
+        if headless:
+            self.gui = None
+        else:
+            from gameboard import GameBoard
+            self.gui = GameBoard("Lost Rover", self, Game.SIZE, backend=backend,
+                                 compositeMap=composite_map)
+        if room_type == None:
+            room_type = Room
+        self.room_type = room_type
+        self.rng = random.Random(seed)
+        self.rover = Rover(self.rng)
+        self.rooms = RoomStore(max_rooms)
+        self.room_seed = self.rng.getrandbits(64)
+        self.room = self._room(self.room_seed, None)
+        self.inventory = Inventory()
         self.portal_stack = MyStack()
         self.task_queue = Queue()
         self.should_add_task = False
@@ -40,7 +88,8 @@ class Game:
           Returns:
             The graphical interface running
         """
-        
+        if self.gui is None:
+            raise RuntimeError("A headless game has no GUI to start")
         self.gui.run()
 
     def getRoverImage(self):
@@ -55,14 +104,11 @@ class Game:
 
     def getRoverLocation(self):
         """ Called by GUI when screen updates.
-            Returns location (as a Point).
+            Returns location (as a Position).
 
             Returns:
                 The rover position          
         """
-        # Adds another task every specified number of steps
-        if self.rover.step_count % Game.STEP_COUNT == 0:
-            self._add_task()
         return self.rover.get_position()
 
     def getImage(self, point):
@@ -72,9 +118,6 @@ class Game:
         coordinates. ('engine.ppm' or 'cake.ppm' or 
         'portal.ppm', etc)
 
-        Also handles linking portals and running the gui to
-        load new rooms if the rover is on the portal 
-
             Args:
                 point: A point object with coordinates
              
@@ -85,67 +128,139 @@ class Game:
         y = point.getY()
         item = self.room.get_object(x,y)
 
-        if str(item) == "Part":
-            return item.get_image()
-
-        elif str(item) == 'Portal':
-            if self._check_if_rover_on_item(item): # Rover on portal
-                
-                if item.linked_portal != None: # Portal is linked
-                    self.room = item.linked_portal.get_room()
-                    old_portal = self.portal_stack.pop()
-                    old_portal.toggle_portal()
-
-                else: 
-                    new_room = Room(Game.SIZE) 
-                    # Generates new room with given new_room and a newly generated portal
-                    new_portal = Portal(item.x, item.y, new_room, item)
-                    self.portal_stack.push(new_room)
-                    self._generate_new_room(new_room, new_portal)
-
-                self.gui.run()
-            else:
-                return item.get_image()
+        if item.kind != EMPTY_KIND:
+            return item.image
 
-        elif str(item) == 'Ship Component':
-            return item.get_image()
+    def getRoomVersion(self):
+        """ Called by GUI when screen updates.
+            Returns the current room and its version, which goes up every
+        time a cell of the room changes. The GUI keeps them to ask
+        getChangedCells what changed since it last drew.
 
-    def _check_if_rover_on_item(self, item):
-        """ Returns true or false if the rover is on item passed to the function
+            Returns:
+                (room, version)
+        """
+        return self.room, self.room.version
 
-            Args:
-                item: item to check if the rover is on it
+    def getChangedCells(self, version):
+        """ Called by GUI when screen updates.
+            Returns the set of (x, y) cells of the current room whose image
+        may have changed since the room was at version, or None if that is
+        too long ago and the whole map has to be redrawn. Changes nothing.
 
+            Args:
+                version: a version returned by getRoomVersion for this room
             Returns:
-                True or false regarding whether the rover is on the item
+                The changed cells or None
         """
-        return [self.rover.x, self.rover.y] == [item.x, item.y]
+        return self.room.changed_since(version)
 
-    def _generate_new_room(self, room, item):
-        """ Generates a new room with the new linked portal added
+    def tick(self, action):
+        """ Applies one player action and advances the game by one step.
 
-            Args: 
-                room: the room to set
-                item: the portal to be added
+        This is the only place the game changes: after a move the rover goes
+        through the portal it landed on, and every STEP_COUNT steps another
+        task is added. The methods the GUI calls to draw the board only read.
+
+            Args:
+                action: one of 'up', 'down', 'left', 'right', 'pick up',
+                    'perform task' or 'way back'
+        """
+        steps = self.rover.step_count
+        if action == 'up':
+            self.rover.move_up()
+        elif action == 'down':
+            self.rover.move_down()
+        elif action == 'left':
+            self.rover.move_left()
+        elif action == 'right':
+            self.rover.move_right()
+        elif action == 'pick up':
+            self._pick_up()
+        elif action == 'perform task':
+            self._perform_task()
+        elif action == 'way back':
+            self._show_way_back()
+        else:
+            raise ValueError('Unknown action: ' + str(action))
+
+        if self.rover.step_count != steps: # the rover moved
+            self._travel_if_on_portal()
+            # Adds another task every specified number of steps
+            if self.rover.step_count % Game.STEP_COUNT == 0:
+                self.add_task()
+
+    def _travel_if_on_portal(self):
+        """ Sends the rover through the portal it is standing on, if any.
+        Called by tick once after every move, so each step through a portal
+        is a single change of room.
+        """
+        item = self.room.get_object(self.rover.x, self.rover.y)
+        if item.kind == PORTAL_KIND:
+            self._travel_through_portal(item)
+
+    def _travel_through_portal(self, item):
+        """ Switches to the room on the other side of a portal. The portal
+        back to the previous room leads back down the portal stack, any
+        other portal leads on to the room made from its seed.
+
+            Args:
+                item: the portal the rover is standing on
         """
-        self.room = room
-        self.room.add_item(item)
-        item.set_room(room)
-        self.startGame()
+        if item is self.room.linked_portal: # Portal leads back
+            if item.get_image() == 'portal-flashing.ppm':
+                self.room.toggle_portal() # stop the way back flashing
+            self._leave_room()
+            seed = self.portal_stack.pop()
+            back_seed = self.portal_stack.peek() # None at the first room
+
+        else: 
+            self._leave_room()
+            self.portal_stack.push(self.room_seed)
+            seed = item.target_seed
+            back_seed = self.room_seed
+        self.room_seed = seed
+        self.room = self._room(seed, back_seed)
+
+    def _leave_room(self):
+        """ Drops the current room if it hasn't been changed; it can be made
+        again from its seed
+        """
+        if not self.room.modified:
+            self.rooms.discard(self.room_seed)
+
+    def _room(self, seed, back_seed):
+        """ Returns the room with the given seed, generating it if it isn't
+        kept. Generating a room from the same seeds always gives the same room.
+
+            Args:
+                seed: the seed of the room
+                back_seed: the seed of the room its way back leads to, None
+                    for the first room, which has no way back
+        """
+        room = self.rooms.get(seed)
+        if room == None:
+            rng = random.Random(seed)
+            room = self.room_type(Game.SIZE, rng)
+            if back_seed != None:
+                room.add_item(Portal(0, 0, room, back_seed), rng)
+            room.modified = False
+            self.rooms.put(seed, room)
+        return room
 
     def goUp(self):
         """ Called by GUI when button clicked.
             If legal, moves rover. If the rover lands
             on a portal, it will teleport. 
         """
-        self.rover.move_up()
+        self.tick('up')
 
     def goDown(self):
         """ Called by GUI when button clicked. 
             If legal, moves rover. If the rover lands
             on a portal, it will teleport. 
         """
-        self.rover.move_down()
+        self.tick('down')
 
     def goLeft(self):
         """ Called by GUI when button clicked. 
@@ -153,21 +268,27 @@ class Game:
             on a portal, it will teleport. 
 
         """
-        self.rover.move_left()
+        self.tick('left')
 
     def goRight(self):
         """ Called by GUI when button clicked. 
             If legal, moves rover. If the rover lands
             on a portal, it will teleport. 
         """
-        self.rover.move_right()
+        self.tick('right')
 
     def showWayBack(self):
         """ Called by GUI when button clicked.
             Flash the portal leading towards home. 
         """
+        self.tick('way back')
+
+    def _show_way_back(self):
+        """ Toggles the flashing of the portal leading back to the room on
+        top of the portal stack
+        """
         if not self.portal_stack._isEmpty():
-            self.portal_stack.peek().toggle_portal()
+            self.room.toggle_portal()
 
     def getInventory(self):
         """ Called by GUI when inventory updates.
@@ -183,22 +304,21 @@ class Game:
         If rover is standing on a part (not a portal 
         or ship component), pick it up and add it
         to the inventory. 
+        """
+        self.tick('pick up')
 
-        Checks if the item isn't empty, a portal, or a ship comp. Then cuts off
-        the .ppm from the image name. Then if it is in the inventory, increment the count
-        up. Otherwise add it to the inventory. After remove it from the room.
+    def _pick_up(self):
+        """ Checks if the item isn't empty, a portal, or a ship comp. Then cuts off
+        the .ppm from the image name and adds it to the inventory. After remove it
+        from the room.
         """
         x = self.rover.get_position().getX()
         y = self.rover.get_position().getY()
         item = self.room.get_object(x,y)        
         
-        if str(item) not in ['Ship Component', 'Portal', '0']:
+        if item.kind == PART_KIND:
             item_name = item.get_image()[:-4].title()
-
-            if self.inventory.check_if_in_list(item_name):
-                self.inventory.increment_count(item_name)
-            else:
-                self.inventory.append(item_name)
+            self.inventory.add(item_name)
             self.room.remove_item(item)
         
     def getCurrentTask(self):
@@ -209,7 +329,7 @@ class Game:
         """
         if len(self.task_queue)==0:
             return "YOU WIN!"
-        return self.task_queue.peek()
+        return str(self.task_queue.peek())
 
     def performTask(self):
         """ Called by the GUI when button clicked.
@@ -217,46 +337,61 @@ class Game:
             is on the relevant broken ship piece, then fixes
             ship piece and removes Part from inventory. If
             we run out of tasks, we win. """
+        self.tick('perform task')
+
+    def _perform_task(self):
+        """ Fixes the ship component under the rover if the inventory holds
+        at least what the current task needs, and uses up exactly that
+        """
+        if len(self.task_queue) == 0:
+            return
+        task = self.task_queue.peek()
         x = self.rover.get_position().getX()
         y = self.rover.get_position().getY()
         item = self.room.get_object(x,y)
-        if str(self.inventory) != '':
-            current_inventory = str(self.inventory).split('\n')
-            
-            is_complete = True
-            for x in self.task_queue.peek().get_reqs():
-                if x not in current_inventory:
-                    is_complete = False
-
-            x = self.rover.get_position().getX()
-            y = self.rover.get_position().getY()
-            item = self.room.get_object(x,y)
-
-            if is_complete and item != 0:
-                if self.task_queue.peek().get_broken_part() == item.get_image():
-                    item.toggle_broken()
-                    self.task_queue.dequeue()
-                    self._clear_inventory()
-
-    def _clear_inventory(self):
-        """ Initializes inventory to new linked list thereby erasing the old one
-        """
-        self.inventory = LinkedList()
-            
-            
+
+        if item.kind == SHIP_COMPONENT_KIND and task.get_broken_part() == item.image:
+            if self.inventory.covers(task.get_reqs()):
+                self.room.toggle_broken(item)
+                self.task_queue.dequeue()
+                self.inventory.consume(task.get_reqs())
 
     def initialize_tasks(self):
         """ I'm thinking you should make a task class with a __repr__. Then add tasks to the queue so you can create 
         another degree of separation. Also you can then call methods on those tasks.
         """
         for x in range(1):
-            self.task_queue.enqueue(Task())
+            self.task_queue.enqueue(Task(self.rng))
 
     def add_task(self):
-        self.task_queue.enqueue(Task())
+        self.task_queue.enqueue(Task(self.rng))
 
    
 
+class Position:
+    """A location in a room. Has the x and y attributes and the getX and
+    getY methods of graphics.Point, without needing Tk.
+
+    Attributes:
+        self.x: The x coord
+        self.y: The y coord
+    """
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __repr__(self):
+        return "Position(" + str(self.x) + ", " + str(self.y) + ")"
+
+    def getX(self):
+        return self.x
+
+    def getY(self):
+        return self.y
+
+
 class Rover:
     """Holds all the data for the rover and functions to apply to it.
 
@@ -267,18 +402,21 @@ class Rover:
         self.y: The y coord of the rover
         self.position: The position object representing the location of the rover
     """
+    __slots__ = ('x', 'y', 'position', 'step_count')
     LOWER_BOUND = 1
     UPPER_BOUND = 14
-    def __init__(self):
-        self.x = randint(Rover.LOWER_BOUND,Rover.UPPER_BOUND)
-        self.y = randint(Rover.LOWER_BOUND,Rover.UPPER_BOUND)
-        self.position = Point(self.x, self.y)
+    def __init__(self, rng = None):
+        if rng == None:
+            rng = random
+        self.x = rng.randint(Rover.LOWER_BOUND,Rover.UPPER_BOUND)
+        self.y = rng.randint(Rover.LOWER_BOUND,Rover.UPPER_BOUND)
+        self.position = Position(self.x, self.y)
         self.step_count = 1
 
     def _set_position(self,x,y):
         """ Sets the position of the rover
         """
-        self.position = Point(x,y)
+        self.position = Position(x,y)
         self.step_count += 1
 
     def get_position(self):
@@ -316,21 +454,68 @@ class Rover:
         self._set_position(self.x, self.y)
 
 
+def _cell_array(size, cells = ()):
+    """ Returns an array for cell numbers of a size x size room, holding the
+    given cells. Two bytes a cell when the numbers fit.
+    """
+    if size*size <= 32767:
+        return array('h', cells)
+    return array('i', cells)
+
+
 class Room:
     """The room that is displayed. Holds all the objects.
 
     Can populate the room, set objects, and initialze the room. Room is populated as soon 
     as the method is called.
 
+    The empty cells are kept in a list as well, with the place of each one
+    in that list, so a random empty cell can be picked, taken and given
+    back without scanning the room. Cells are numbered x*size + y.
+
+    The cells holding items are indexed too, by image name (the kind of an
+    image is in IMAGE_KINDS), so finding the parts, a broken engine or the
+    nearest screw only looks at the items involved.
+
     Attributes:
+        self.size: The width and height of the room
         self.room_matrix: Holds a 2d list of lists that will hold all the objects in the room
+        self.version: Number of cell changes since the room was generated
+        self.changes: Array of the cell numbers changed most recently, the
+            last one changed last; None until the first change
+        self.change_base: The version before the first change in self.changes
+        self.free_cells: Array of the empty cell numbers, in no particular order
+        self.free_index: Array of the index of each cell number in free_cells,
+            -1 for cells that are not empty
+        self.item_cells: Dictionary of image name -> array of the cell
+            numbers holding it
+        self.linked_portal: The portal leading back to the previous room, if any
+        self.modified: Whether an item has been added, removed or changed since
+            the room was generated. Flashing the way back does not count.
     """
-    def __init__(self, size):
+    # Attributes left out when the room is pickled; __setstate__ makes them
+    # again from the rest
+    UNPICKLED = ('free_cells', 'free_index', 'item_cells', 'changes',
+                 'change_base')
+
+    def __init__(self, size, rng = None):
+        if rng == None:
+            rng = random
+        self.size = size
         self.room_matrix= self._initalize_room(size)
-        self._populate_room()
+        self.free_cells = _cell_array(size, range(size*size))
+        self.free_index = _cell_array(size, range(size*size))
+        self.item_cells = {}
+        self.version = 0
+        self.changes = None
+        self._populate_room(rng)
+        self.version = 0 # a new room is always drawn in full
+        self.change_base = 0
+        self.changes = None
         self.linked_portal = None
+        self.modified = False
 
-    def _populate_room(self):
+    def _populate_room(self, rng):
         """ Populates the room with objects 
           There is a count set for each type of item which represents the max number of that
           type of item allowed in the room. It goes through each position in the matrix and 
@@ -338,54 +523,128 @@ class Room:
           of no item being places is the else. Therefore by setting the range of the choice variable
           greater, there will be a greater frequency of empty spaces.
 
+          Args:
+            rng: the random generator to populate the room with
           Returns:
             The updated matrix with objects
         """
         component_count = 10
         part_count = 9
         portal_count = 2
-        max_x = 15
-        max_y = 15
+        max_x = self.size
+        max_y = self.size
+        center = self.size // 2
         for x in range(max_x):
             for y in range(max_y):
-                choice = randint(1,21)
+                choice = rng.randint(1,21)
 
                 if self._check_if_empty(x,y):   # IS EMPTY METHOD
                     back_portal_count = 0
 
                     if choice == 1 and portal_count != 0:
-                        self._set_object(x,y, Portal(x,y, self, None))
+                        self._set_object(x,y, Portal(x,y, self, rng.getrandbits(64)))
                         portal_count -= 1
 
                     elif choice == 2 and part_count != 0:
-                        self._set_object(x,y,Part(x,y))
+                        self._set_object(x,y,Part(x,y,rng))
                         part_count -= 1
 
                     elif choice == 3 and component_count != 0:
                         # Used to limit space for ship components as they must be in center
-                        x_coord = randint(6,8)
-                        y_coord = randint(6,8)
+                        x_coord = rng.randint(center-1,center+1)
+                        y_coord = rng.randint(center-1,center+1)
                         if self.room_matrix != 0:
-                            self._set_object(x_coord,y_coord,ShipComponent(x_coord,y_coord))
+                            self._set_object(x_coord,y_coord,ShipComponent(x_coord,y_coord,rng))
                         component_count -= 1
 
                     else:
-                        self._set_object(x,y,0)    
+                        self._set_object(x,y,EMPTY)    
 
         return self.room_matrix
 
     def toggle_portal(self):
         """ Changes to flashing or to normal depending on the current state of the portal
         """
-        if self.linked_portal.get_image() == 'portal_flashing.ppm':
-            self.linked_portal.change_to_normal()
+        portal = self.linked_portal
+        cell = portal.x*self.size + portal.y
+        self._unindex(cell, portal)
+        if portal.get_image() == 'portal-flashing.ppm':
+            portal.change_to_normal()
         else:
-            self.linked_portal.change_to_flash()
+            portal.change_to_flash()
+        self._index(cell, portal)
+        self._changed(cell)
 
     def toggle_broken(self, item):
         """ Calls the toggle_broken method on the item to change the item 
         """
+        cell = item.x*self.size + item.y
+        self._unindex(cell, item)
         item.toggle_broken()
+        self._index(cell, item)
+        self._changed(cell)
+        self.modified = True
+
+    def _changed(self, cell):
+        """ Records a change to the cell with the given number. Only the
+        last size*size changes are kept; older ones are let go half at a time.
+        """
+        if self.changes is None:
+            self.changes = _cell_array(self.size)
+        elif len(self.changes) >= self.size*self.size:
+            half = len(self.changes) // 2
+            del self.changes[:half]
+            self.change_base += half
+        self.changes.append(cell)
+        self.version += 1
+
+    def changed_since(self, version):
+        """ Returns the cells changed after the room was at version
+
+            Args:
+                version: an earlier value of self.version
+            Returns:
+                Set of (x, y) tuples, or None if the changes go back further
+                than the room remembers
+        """
+        if version < self.change_base:
+            return None
+        if self.changes is None:
+            return set()
+        return set(divmod(cell, self.size)
+                   for cell in self.changes[version - self.change_base:])
+
+    def __getstate__(self):
+        """ Returns the attributes to pickle, leaving out the indexes and
+        the change log, which can be made again from the cells
+        """
+        state = self.__dict__.copy()
+        for name in self.UNPICKLED:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """ Restores a pickled room, rebuilding its indexes. Changes made
+        before it was pickled are forgotten, so a GUI redraws it in full.
+        """
+        self.__dict__.update(state)
+        self.change_base = self.version
+        self.changes = None
+        self._build_index()
+
+    def _build_index(self):
+        """ Makes the empty cell and item indexes from the room's cells
+        """
+        self.free_cells = _cell_array(self.size)
+        self.free_index = _cell_array(self.size, [-1]) * (self.size*self.size)
+        self.item_cells = {}
+        for x in range(self.size):
+            for y in range(self.size):
+                object = self.room_matrix[x][y]
+                if object is EMPTY:
+                    self._free(x*self.size + y)
+                else:
+                    self._index(x*self.size + y, object)
 
     def _check_if_empty(self, x, y):
         """ Check if there isn't an object at that point in the room
@@ -396,34 +655,25 @@ class Room:
             Returns:
                 True if space is empty. False otherwise
         """
-        return self.room_matrix[x][y] == 0
+        return self.room_matrix[x][y] is EMPTY
 
-    def add_item(self, item):
+    def add_item(self, item, rng = None):
         """ Adds item to the room_matrix in a random empty space
 
             Args: 
                 item: item being added to the room_matrix
+                rng: the random generator that picks the space
         """
+        if rng == None:
+            rng = random
 
         if item.get_image() == 'portal.ppm':
             self.linked_portal = item
-        # Only adds one portal
-        empty_room_list = []
-        count = 1
-        for x in range(15):
-            for y in range(15): 
-                if self.room_matrix[x][y] == 0:
-                    empty_room_list += [[x,y]]
-        
-        selected_coords = choice(empty_room_list)
-        empty_x = selected_coords[0]
-        empty_y = selected_coords[1]
 
-        if count > 0:
-            self._set_object(empty_x, empty_y, item)
-            item.x = empty_x
-            item.y = empty_y
-            count -= 1
+        empty_x, empty_y = divmod(rng.choice(self.free_cells), self.size)
+        self._set_object(empty_x, empty_y, item)
+        item.x = empty_x
+        item.y = empty_y
 
     def remove_item(self, item):
         """ Removes item from the room_matrix
@@ -434,7 +684,7 @@ class Room:
         x = item.get_position().getX()
         y = item.get_position().getY()
 
-        self.room_matrix[x][y] = 0
+        self._set_object(x, y, EMPTY)
 
     def get_object(self, x, y):
         """ Returns the object at the specified x and y coords
@@ -442,12 +692,131 @@ class Room:
         return self.room_matrix[x][y]
 
     def _set_object(self,x,y,object):
+        cell = x*self.size + y
+        old = self.room_matrix[x][y]
+        if old is not EMPTY:
+            self._unindex(cell, old)
         self.room_matrix[x][y] = object
+        self._changed(cell)
+        self.modified = True
+        if object is EMPTY:
+            self._free(cell)
+        else:
+            self._take(cell)
+            self._index(cell, object)
+
+    def _index(self, cell, item):
+        """ Records that cell holds item in self.item_cells
+        """
+        cells = self.item_cells.get(item.image)
+        if cells == None:
+            IMAGE_KINDS[item.image] = item.kind
+            cells = self.item_cells[item.image] = _cell_array(self.size)
+        cells.append(cell)
+
+    def _unindex(self, cell, item):
+        """ Removes cell from the entry of item in self.item_cells, dropping
+        entries that become empty
+        """
+        cells = self.item_cells[item.image]
+        cells.remove(cell)
+        if not cells:
+            del self.item_cells[item.image]
+
+    def cells_of_kind(self, kind):
+        """ Returns the cells holding items of the given kind
+
+            Args:
+                kind: one of the item kinds, e.g. PART_KIND
+            Returns:
+                List of (x, y) tuples
+        """
+        cells = []
+        for image, image_cells in self.item_cells.items():
+            if IMAGE_KINDS[image] == kind:
+                cells += [divmod(cell, self.size) for cell in image_cells]
+        return cells
+
+    def cells_of_image(self, image):
+        """ Returns the cells holding items that show the given image
+
+            Args:
+                image: the image name, e.g. 'enginebroken.ppm'
+            Returns:
+                List of (x, y) tuples
+        """
+        return [divmod(cell, self.size) for cell in self.item_cells.get(image, ())]
+
+    def nearest(self, x, y, kind = None, image = None):
+        """ Finds the item closest to x, y in rover steps (moving one cell
+        up, down, left or right at a time). Only the matching items are
+        looked at, not the whole room.
+
+            Args:
+                x: the x coord to measure from
+                y: the y coord to measure from
+                kind: only look at items of this kind
+                image: only look at items showing this image
+            Returns:
+                The nearest matching item, or None if there is none
+        """
+        if image != None:
+            cells = self.cells_of_image(image)
+        elif kind != None:
+            cells = self.cells_of_kind(kind)
+        else:
+            cells = [divmod(cell, self.size)
+                     for image_cells in self.item_cells.values()
+                     for cell in image_cells]
+        if not cells:
+            return None
+        best_x, best_y = min(cells, key=lambda cell: abs(cell[0] - x) + abs(cell[1] - y))
+        return self.room_matrix[best_x][best_y]
+
+    def _free(self, cell):
+        """ Adds cell to the empty cells, if it isn't there already
+        """
+        if self.free_index[cell] == -1:
+            self.free_index[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
+
+    def _take(self, cell):
+        """ Removes cell from the empty cells, if it is there, by moving the
+        last empty cell into its place
+        """
+        i = self.free_index[cell]
+        if i != -1:
+            self.free_index[cell] = -1
+            last = self.free_cells.pop()
+            if last != cell:
+                self.free_cells[i] = last
+                self.free_index[last] = i
 
     def _initalize_room(self,size):
-        """ Initalizes room with zeros. Size dependent on given input.
+        """ Initalizes room with EMPTY cells. Size dependent on given input.
         """
-        return [[0 for x in range(size)] for y in range(size)]
+        return [[EMPTY for x in range(size)] for y in range(size)]
+
+
+class Empty:
+    """What an empty cell holds. There is only one, EMPTY, so a cell can be
+    checked with "is EMPTY". Pickling keeps it that way.
+
+    Attributes:
+        kind: EMPTY_KIND
+        image: None, empty cells are not drawn
+    """
+    __slots__ = ()
+    kind = EMPTY_KIND
+    image = None
+
+    def __repr__(self):
+        return "0"
+
+    def __reduce__(self):
+        return "EMPTY"
+
+EMPTY = Empty()
 
 
 class Item:
@@ -459,16 +828,25 @@ class Item:
         self.x: The x coord of the item
         self.y: The y coord of the item
         self.image: The image of the specific item
+
+    Items use __slots__ instead of a __dict__, since every room holds
+    dozens of them and changed rooms are kept for the rest of the game,
+    in memory or pickled to disk. Each subclass sets kind, which tells
+    what sort of item it is.
     """
-    def __init__(self, x, y):
+    __slots__ = ('x', 'y', 'image')
+
+    def __init__(self, x, y, rng = None):
+        if rng == None:
+            rng = random
         self.x = x
         self.y = y
-        self.image = self._set_image()
+        self.image = self._set_image(rng)
 
     def get_position(self):
         """ Returns a Position object using the x an y coords of the item passed to it
         """
-        return Point(self.x, self.y)
+        return Position(self.x, self.y)
     def get_image(self):
         """ Gets image of part
 
@@ -487,20 +865,23 @@ class Portal(Item):
         self.x: The x coord of the item
         self.y: The y coord of the item
         self.image: The image of the specific item
-        self.last_room = reference to room portal links to if at all
-        self.linked_portal = reference to portal this item is linked to if at all
+        self.last_room = reference to the room the portal is in
+        self.target_seed = seed of the room the portal leads to
     """
-    def __init__(self, x, y, room, Portal):
+    __slots__ = ('last_room', 'target_seed')
+    kind = PORTAL_KIND
+
+    def __init__(self, x, y, room, target_seed):
         self.x = x
         self.y = y
         self.image = self._set_image()
         self.last_room = room
-        self.linked_portal = Portal
+        self.target_seed = target_seed
     
     def __repr__(self):
         return "Portal"
 
-    def _set_image(self):
+    def _set_image(self, rng = None):
 
         return 'portal.ppm'
 
@@ -523,10 +904,10 @@ class Portal(Item):
         self.last_room = room
 
     def get_room(self):
-        """ Gets the last_room reference in the Portal item. Used when traveling through portals
+        """ Gets the last_room reference in the Portal item
 
         Returns:
-            self.last_room - the last room the user was in
+            self.last_room - the room the portal is in
         """
         return self.last_room
 
@@ -536,17 +917,21 @@ class Part(Item):
 
         Able to get image.
     """
+    __slots__ = ()
+    kind = PART_KIND
 
     def __repr__(self):
         return "Part"
 
-    def _set_image(self):
+    def _set_image(self, rng):
         """ Sets the image of the different parts. Random in order to create variation
 
+        Args:
+            rng: the random generator that picks the part
         Returns:
             The string of the image file needed to be added
         """
-        choice = randint(1,5)
+        choice = rng.randint(1,5)
         if choice == 1:
             return 'cake.ppm'
         elif choice == 2:
@@ -564,18 +949,22 @@ class ShipComponent(Item):
 
         Able to get image. and toggle_broken item to change an item to the broken counterpart.
     """ 
+    __slots__ = ()
+    kind = SHIP_COMPONENT_KIND
 
     def __repr__(self):
         return "Ship Component" 
 
-    def _set_image(self):
+    def _set_image(self, rng):
         """ Sets the image of the different componenets, normal and broken. Random in order to create variation
 
+        Args:
+            rng: the random generator that picks the component
         Returns:
             The string of the image file needed to be added
         """
         
-        choice = randint(1,7)
+        choice = rng.randint(1,7)
         if choice == 1:
             return 'cabin.ppm'
         elif choice == 2:
@@ -584,7 +973,7 @@ class ShipComponent(Item):
             return 'exhaust.ppm'
         else:
             # Used to create broken comps as well
-            broken_choice = randint(1,3)
+            broken_choice = rng.randint(1,3)
             if broken_choice == 1:
                 return 'cabinbroken.ppm'
             elif broken_choice == 2:
@@ -600,113 +989,315 @@ class ShipComponent(Item):
         self.image = self.image[:-4] + 'broken.ppm'
 
 
-class Node:
-    """A simple Node class
+class Inventory:
+    """The parts the rover is carrying, counted by name.
+
+    Backed by a dictionary, so checking, adding and removing a part take the
+    same time no matter how many kinds of parts there are. Names stay in the
+    order they were first picked up.
+
+    The text shown by the GUI is cached and only rebuilt after the
+    inventory has changed, so refreshing an unchanged inventory is free.
 
     Data attributes:
-        self.data: data of any type to be stored in the node
-        self.next: a pointer to the next node. next will be None
-            if there are no more nodes.
+        self.counts: Dictionary of part name -> number carried
+        self.version: Increases every time a part is added or removed
+        self.rebuilds: Number of times the text has been rebuilt
     """
-    def __init__(self, data = None, count = 0, next = None):
-        self.data = data
-        self.count = count
-        self.next = next
 
+    def __init__(self):
+        self.counts = {}
+        self.version = 0
+        self.rebuilds = 0
+        self._text = ''
+        self._text_version = 0
 
-class LinkedList:
-    """A basic Linked List data structure
+    def __repr__(self):
+        """ Creates a visual representation of the inventory
 
-    Data attributes:
-        self.head: a reference to the first Node in the list.
-                self.head will basice None if the list is empty
-        self.size: Represents the size of the list. Updated when 
-                list is appended
-    """
+        Returns:
+            The count of each part then a space then its name, one
+            part per line
+        """
+        if self._text_version != self.version:
+            self._text = ''.join([str(count) + ' ' + name + '\n'
+                                  for name, count in self.counts.items()])
+            self._text_version = self.version
+            self.rebuilds += 1
+        return self._text
+
+    def __len__(self):
+        """ Returns the number of different parts carried
+        """
+        return len(self.counts)
+
+    def __contains__(self, name):
+        """ Returns True if at least one of the named part is carried
+        """
+        return name in self.counts
 
-    def __init__(self, python_list = None):
-        """ Initializes a new linked list.
+    def count(self, name):
+        """ Returns how many of the named part are carried
 
-        If no arguments are provided, an empty list is created.
-        Otherwise, a python
+        Args:
+            name: the name of the part
         """
-        self.head = None
-        self.size = 0
+        return self.counts.get(name, 0)
 
-        if python_list is not None:
-            self._create_list(python_list)
+    def add(self, name, quantity = 1):
+        """ Adds quantity of the named part
 
-    def __repr__(self):
-        """ Creates a visual representation of the list
+        Args:
+            name: the name of the part
+            quantity: how many to add
+        """
+        self.counts[name] = self.counts.get(name, 0) + quantity
+        self.version += 1
 
-        Returns:
-            The count of the node then a space then the name of the
-            current node. Also places each node on its own line
+    def remove(self, name, quantity = 1):
+        """ Removes quantity of the named part. A part is dropped from the
+        inventory when none are left.
+
+        Args:
+            name: the name of the part
+            quantity: how many to remove
+        Raises:
+            ValueError: if fewer than quantity are carried
         """
-        linked_list = ""
-        curr_node = self.head
-        while curr_node:
-            linked_list += str(curr_node.count) + " " + str(curr_node.data) + '\n'
-            curr_node = curr_node.next
-        return linked_list
+        count = self.counts.get(name, 0)
+        if count < quantity:
+            raise ValueError('Only ' + str(count) + ' ' + name + ' in inventory')
+        if count == quantity:
+            del self.counts[name]
+        else:
+            self.counts[name] = count - quantity
+        self.version += 1
 
-    def check_if_in_list(self, name):
-        """ Checks and returns boolean representing whether or not the 
-        given object is in the list by comparing the names of each node
+    def covers(self, requirements):
+        """ Checks whether the inventory holds at least the required number
+        of every part
 
         Args:
-            name: the name being checked in the list
+            requirements: dictionary of part name -> quantity needed
         Returns:
-            in_list: a boolean representing whether the name is in the list
+            True if every requirement is met
         """
-        curr_node = self.head
-        in_list = False
+        for name, quantity in requirements.items():
+            if self.counts.get(name, 0) < quantity:
+                return False
+        return True
 
-        while (self.head is not None and curr_node is not None): 
-            if curr_node.data == str(name):
-                in_list = True
-            curr_node = curr_node.next
-        return in_list
+    def consume(self, requirements):
+        """ Removes exactly the required parts, leaving anything extra
 
-    def increment_count(self, item):
-        """ Increments the count up by one for an item. Called when item already
-        exists in the list.
+        Args:
+            requirements: dictionary of part name -> quantity needed
+        """
+        for name, quantity in requirements.items():
+            self.remove(name, quantity)
 
-            Args:
-                item: item to increment count for
-        """
-        curr_node = self.head
-        count = 0
-        while count < self.size: 
-            if curr_node.data == str(item):
-                curr_node.count += 1
-                
-                return
-            else:
-                curr_node = curr_node.next
-            count+=1
 
-    def append(self, name):
-        """ Appends a new node containing data at the end of the list.
+class RoomStore:
+    """The rooms of a game by seed, at most capacity of them in memory.
+
+    When a room has to make way, the one used longest ago goes. If it was
+    changed it is pickled to the end of a spill file and read back when it
+    is asked for again; if not, it is simply dropped, since the game can
+    make it again from its seed. A room read back keeps its place in the
+    file, so if it has not changed again by the time it makes way it is
+    dropped without being written twice. Copies that are out of date leave
+    dead bytes behind; once there are more of those than live ones the
+    file is rewritten with only the live copies.
+
+    Memory does not level off entirely: every room in the spill file keeps
+    an entry in offsets, about 150 to 200 bytes with its seed, for the rest
+    of the game.
+
+    Attributes:
+        self.capacity: Number of rooms kept in memory
+        self.rooms: Dictionary of seed -> Room in memory, oldest use first
+        self.offsets: Dictionary of seed -> (offset, length, version) of the
+            rooms in the spill file, version being the room's version when
+            it was written
+        self.filename: Name of the spill file, None for a temporary file
+        self.live: Bytes of the spill file holding current copies of rooms
+        self.dead: Bytes of the spill file holding copies out of date
+        self.hits: Rooms found in memory
+        self.misses: Rooms not in memory, whether or not they were on disk
+        self.evictions: Rooms that made way for others
+        self.spills: Evicted rooms written to the spill file
+        self.loads: Rooms read back from the spill file
+        self.compactions: Times the spill file was rewritten
+    """
+    CAPACITY = 64
+
+    def __init__(self, capacity = None, filename = None):
+        if capacity == None:
+            capacity = RoomStore.CAPACITY
+        self.capacity = max(capacity, 1)
+        self.rooms = {}
+        self.offsets = {}
+        self.filename = filename
+        self.file = None
+        self.live = 0
+        self.dead = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spills = 0
+        self.loads = 0
+        self.compactions = 0
+
+    def __len__(self):
+        """ Returns the number of rooms kept, in memory or on disk
+        """
+        in_memory_only = 0
+        for seed in self.rooms:
+            if seed not in self.offsets:
+                in_memory_only += 1
+        return len(self.offsets) + in_memory_only
+
+    def __contains__(self, seed):
+        """ Returns True if the room with the given seed is kept
+        """
+        return seed in self.rooms or seed in self.offsets
+
+    def get(self, seed):
+        """ Returns the room with the given seed, reading it back from the
+        spill file if it was written there
 
         Args:
-            name: the data that will be appended to the current list
+            seed: the seed of the room
+        Returns:
+            The room, or None if it isn't kept
         """
-        new_node = Node(name, 1)
-        if self.head is None:
-            self.head = new_node
-        else: 
-            curr_node = self.head
-            while curr_node.next is not None: 
-                curr_node = curr_node.next
-            curr_node.next = new_node
-        self.size += 1
+        room = self.rooms.pop(seed, None)
+        if room != None:
+            self.hits += 1
+            self.rooms[seed] = room # most recently used goes last
+            return room
+        self.misses += 1
+        if seed not in self.offsets:
+            return None
+        offset, length, version = self.offsets[seed]
+        self.file.seek(offset)
+        room = pickle.loads(self.file.read(length))
+        self.loads += 1
+        self.rooms[seed] = room
+        while len(self.rooms) > self.capacity:
+            self._evict()
+        return room
+
+    def put(self, seed, room):
+        """ Keeps room in memory, making way for it if the store is full
+
+        Args:
+            seed: the seed of the room
+            room: the room to keep
+        """
+        self.rooms.pop(seed, None)
+        self._forget(seed)
+        self.rooms[seed] = room
+        while len(self.rooms) > self.capacity:
+            self._evict()
+
+    def discard(self, seed):
+        """ Stops keeping the room with the given seed, if it is kept
+        """
+        self.rooms.pop(seed, None)
+        self._forget(seed)
+
+    def _forget(self, seed):
+        """ Marks the copy of the room with the given seed in the spill
+        file, if there is one, as dead
+        """
+        entry = self.offsets.pop(seed, None)
+        if entry != None:
+            self.live -= entry[1]
+            self.dead += entry[1]
+
+    def _evict(self):
+        """ Removes the least recently used room from memory, spilling it to
+        the file if it has been changed since it was generated or last
+        written
+        """
+        seed = next(iter(self.rooms))
+        room = self.rooms.pop(seed)
+        self.evictions += 1
+        entry = self.offsets.get(seed)
+        if entry != None and entry[2] == room.version:
+            return # the copy in the file is current
+        self._forget(seed)
+        if room.modified:
+            if self.file == None:
+                self.file = self._open()
+            if self.dead > self.live:
+                self._compact()
+            data = pickle.dumps(room, pickle.HIGHEST_PROTOCOL)
+            self.file.seek(0, 2)
+            self.offsets[seed] = (self.file.tell(), len(data), room.version)
+            self.file.write(data)
+            self.live += len(data)
+            self.spills += 1
+
+    def _open(self, filename = None):
+        """ Opens an empty spill file: the named one, or a temporary file
+        """
+        if filename == None:
+            return tempfile.TemporaryFile()
+        return open(filename, 'w+b')
+
+    def _compact(self):
+        """ Rewrites the spill file with only the current copies of rooms
+        """
+        if self.filename == None:
+            compacted = self._open()
+        else:
+            compacted = self._open(self.filename + '.new')
+        offsets = {}
+        for seed, (offset, length, version) in self.offsets.items():
+            self.file.seek(offset)
+            offsets[seed] = (compacted.tell(), length, version)
+            compacted.write(self.file.read(length))
+        self.file.close()
+        if self.filename != None: # reopened, some systems can't rename open files
+            compacted.close()
+            os.replace(self.filename + '.new', self.filename)
+            compacted = open(self.filename, 'r+b')
+        self.file = compacted
+        self.offsets = offsets
+        self.dead = 0
+        self.compactions += 1
+
+    def stats(self):
+        """ Returns a dictionary of the store's counters
+        """
+        return {"size": len(self.rooms), "capacity": self.capacity,
+                "on disk": len(self.offsets), "live bytes": self.live,
+                "dead bytes": self.dead, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions,
+                "spills": self.spills, "loads": self.loads,
+                "compactions": self.compactions}
+
+    def close(self):
+        """ Closes the spill file. A temporary file is deleted.
+        """
+        if self.file != None:
+            self.file.close()
+            self.file = None
+        self.offsets = {}
+        self.live = 0
+        self.dead = 0
 
 
 class MyStack:
     """ Implement this Stack ADT using a Python list to hold elements.
          
         Do NOT use the len() feature of lists.
+
+        The array doubles when it is full and halves when the stack falls
+        to a quarter of it, so deep portal chains can be walked back
+        without holding on to the memory.
     """
     CAPACITY = 4
     def __init__( self ):
@@ -716,10 +1307,15 @@ class MyStack:
         self._size = 0
         self._array = [''] * self._capacity
 
+    def __iter__( self ):
+        """ Yields the items from the top of the stack to the bottom. """
+        for i in range(self._size - 1, -1, -1):
+            yield self._array[i]
+
     def _isEmpty( self ):
         """ Is the stack empty? 
         Returns True if the stack is empty; False otherwise. """
-        return self._array == ['']*self._capacity
+        return self._size == 0
 
     def push( self, item ):
         """ Push the item onto the top of the stack. """
@@ -732,6 +1328,7 @@ class MyStack:
         popped_item = self._array[self._size-1]
         self._array[self._size-1] = ''
         self._size -=1
+        self._shrink_if_needed()
         return popped_item
 
     def peek( self ):
@@ -740,39 +1337,57 @@ class MyStack:
             return self._array[self._size-1]
 
     def _double_if_needed(self):
-        """ If the capacity of the queue is reached (size=capacity), double the capacity
+        """ If the capacity of the stack is reached (size=capacity), double the capacity
         """
-        if self._capacity - 1 == self._size:
+        if self._capacity == self._size:
             self._array += ['']*self._capacity
             self._capacity = self._capacity*2
+
+    def _shrink_if_needed(self):
+        """ If the stack has fallen to a quarter of its capacity, halve the capacity
+        """
+        if self._capacity > MyStack.CAPACITY and self._size <= self._capacity // 4:
+            self._capacity = self._capacity // 2
+            self._array = self._array[:self._capacity]
  
 
 class Queue:  #O(1)
-    """ Is the queue that holds all the nodes with data provided to it.
+    """ Is the queue that holds the tasks, in the order they were added.
 
-    Can enqueue, dequeue, and peek as well as get the length of the queue 
+    A ring buffer over a preallocated list: head is the slot of the first
+    item and the items wrap around the end of the list. The list doubles
+    when it is full and halves when it falls to a quarter full, so enqueue
+    and dequeue take the same time no matter how long the queue is.
 
     Attributes:
-        self.size: Number of nodes in the queue
-        self.head: The first in line of the queue
-        self.tail: The last in line of the queue
+        self.size: Number of items in the queue
+        self.capacity: Number of slots in self.array
+        self.head: Slot of the first in line of the queue
+        self.array: The slots, empty ones hold None
+        self.shrink: Whether the array is halved when the queue empties out
     """
     QUEUE_CAPACITY = 6
-    def __init__(self, python_list = None):
+    def __init__(self, python_list = None, shrink = True):
         self.size = 0
         self.capacity = Queue.QUEUE_CAPACITY
-        self.head = None
-        self.tail = None
-        self.array = [''] * self.capacity
-        
+        self.head = 0
+        self.array = [None] * self.capacity
+        self.shrink = shrink
+
         if python_list is not None:
-            self._create_list(python_list)
+            self.extend(python_list)
 
     def __len__(self):  #O(1)
         """ Returns the size of the queue
         """
         return self.size  #O(1)
 
+    def __iter__(self):  #O(n)
+        """ Yields the items from the front of the queue to the back
+        """
+        for i in range(self.size):
+            yield self.array[(self.head + i) % self.capacity]
+
     def _isEmpty(self):  #O(1)
         """Returns a boolean if it is empty or not"""
 
@@ -782,86 +1397,109 @@ class Queue:  #O(1)
         """ Returns boolean if it is full or not"""
         return self.size == self.capacity  #O(1)
 
-    def enqueue(self, data):  #O(1)
-        """ Enqueue's nodes into the queue
-
-        Creates a new node. Uses a tail and head pointer
-        to add the new node to the back of the queue.
+    def _resize(self, capacity):  #O(n), amortized O(1) per enqueue/dequeue
+        """ Moves the items to the front of a new array of the given capacity
 
         Args:
-            data - data for the new node
-
+            capacity - number of slots in the new array
         """
-        new_node = Node(data)  #O(1)
-        
-        if self._isFull():  #O(1)
-            self.capacity = self.capacity*2  #O(1)
+        array = list(self)
+        array += [None] * (capacity - self.size)
+        self.array = array
+        self.capacity = capacity
+        self.head = 0
 
-        if self._isEmpty():  #O(1)
-            self.head = new_node  #O(1)
-            self.tail = new_node    #O(1) 
-        else:  #O(1)
-            self.tail.next = new_node  #O(1)
-            self.tail = new_node  #O(1)
-            self.tail.next = self.head  #O(1)
+    def enqueue(self, data):  #O(1)
+        """ Adds data to the back of the queue, doubling the array if it is
+        full
+
+        Args:
+            data - the item to add
+        """
+        if self._isFull():  #O(1) amortized
+            self._resize(self.capacity*2)
+        self.array[(self.head + self.size) % self.capacity] = data  #O(1)
         self.size += 1  #O(1)
 
-    def dequeue(self):  #O(1)
-        """ Dequeue's nodes from the stack and returns its data
+    def extend(self, items):  #O(k)
+        """ Adds every item of an iterable to the back of the queue, growing
+        the array at most once
 
-        Saves data of head node into a variable. Then sets head to the next node in line which
-        eliminates it from the stack. Then returns this data.
+        Args:
+            items - iterable of items, added in order
+        """
+        items = list(items)
+        needed = self.size + len(items)
+        if needed > self.capacity:
+            capacity = self.capacity
+            while capacity < needed:
+                capacity = capacity*2
+            self._resize(capacity)
+        for data in items:
+            self.array[(self.head + self.size) % self.capacity] = data
+            self.size += 1
+
+    def dequeue(self):  #O(1)
+        """ Removes the front item and returns it. The slot is cleared so the
+        queue does not keep the item alive.
 
         Returns:
+            None - if queue is empty
             data - data from the head of the queue
         """
         if self._isEmpty():  #O(1)
             return None  #O(1)
-        else:
-            data = self.head.data  #O(1)
-            self.head = self.head.next  #O(1)
-            self.size -= 1  #O(1)
-            
-            return data  #O(1)
+        data = self.array[self.head]  #O(1)
+        self.array[self.head] = None  #O(1)
+        self.head = (self.head + 1) % self.capacity  #O(1)
+        self.size -= 1  #O(1)
+        if (self.shrink and self.capacity > Queue.QUEUE_CAPACITY
+                and self.size <= self.capacity // 4):  #O(1) amortized
+            self._resize(max(self.capacity // 2, Queue.QUEUE_CAPACITY))
+        return data  #O(1)
 
     def peek(self):  #O(1)
         """ Returns the head of the queue. If empty, returns None.
 
         Returns:
             None - if queue is empty
-            self.head.data - the data from the head of the queue
+            data - the data from the head of the queue
         """
         if self._isEmpty():  #O(1)
             return None  #O(1)
-        else:
-            return self.head.data  #O(1)
-        
+        return self.array[self.head]  #O(1)
+
+
 class Task:
     """ Is the queue that holds all the nodes with data provided to it.
 
     Can enqueue, dequeue, and peek as well as get the length of the queue 
 
     Attributes:
-        self.task_requirements: List of all three reuirements for each task
+        self.task_requirements: Dictionary of part name -> quantity for the three requirements
         self.broken_item: Item needed to be fixed for this task
         self.task_text: Formatted string representing the whole description and requirements
     """
 
-    def __init__(self):
-        self.task_requirements = []
+    def __init__(self, rng = None):
+        if rng == None:
+            rng = random
+        self.task_requirements = {}
         self.broken_item = ''
-        self.task_text = self._initialize_task()
+        self.task_text = self._initialize_task(rng)
         
     def __repr__(self):
         """ Overloads the str() function and returns the task_text if called"""
         return self.task_text
 
-    def _initialize_task(self):
+    def _initialize_task(self, rng):
         """ Initializes the task with reuirements and a task description
 
         Selects a random part that needs to be fixed. Then randomly selects three requirements. 
         Finally returns the total, correctly formatted task text
 
+        Args:
+            rng: the random generator that picks the part and requirements
         Returns:
             task_text - Formatted description of the entire task with the issue and requirements
 
@@ -870,7 +1508,7 @@ class Task:
         Returns:
             data - data from the head of the queue
         """
-        broken_part_index = randint(0,2)
+        broken_part_index = rng.randint(0,2)
         broken_part_list = ['Broken Engine!', 'Smog Check! Your exhaust is broken.', 'Your cabin has cracked. You can not fly without it']
         text = broken_part_list[broken_part_index] + '\n' + "You will need to collect these items:"
 
@@ -884,26 +1522,24 @@ class Task:
         item_list = ['Screw', "Cake", "Lettuce", "Bagel", "Gear"]
 
         for x in range(3):
-            quantity = randint(1,3)
-            rand_item_int = randint(0, len(item_list)-1)
-            self.task_requirements += [str(quantity) + ' ' + item_list[rand_item_int]]
+            quantity = rng.randint(1,3)
+            rand_item_int = rng.randint(0, len(item_list)-1)
             item = item_list.pop(rand_item_int)
-            # if quantity == 1 and item is not 'Lettuce':
+            self.task_requirements[item] = quantity
 
-            #     self.task_requirements[x] = self.task_requirements[x][:-1]
         task_text = text
-        for x in self.task_requirements:
-            if x != 'Lettuce' and quantity != 1:
-                task_text += '\n' + '- ' + x + 's'
+        for item, quantity in self.task_requirements.items():
+            if item != 'Lettuce' and quantity != 1:
+                task_text += '\n' + '- ' + str(quantity) + ' ' + item + 's'
             else:
-                task_text += '\n' + '- ' + x 
+                task_text += '\n' + '- ' + str(quantity) + ' ' + item
         return task_text
 
     def get_reqs(self):
         """ Returns the requirements for the task 
 
         Returns:
-            self.task_requirements - The task requirements as a string
+            self.task_requirements - Dictionary of part name -> quantity needed
         """
         return self.task_requirements
 
@@ -915,6 +1551,7 @@ class Task:
         """
         return self.broken_item
 
-""" Launch the game. """
-g = Game()
-g.startGame() # This does not return until the game is over
\ No newline at end of file
+if __name__ == "__main__":
+    # Launch the game.
+    g = Game()
+    g.startGame() # This does not return until the game is over
\ No newline at end of file
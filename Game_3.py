@@ -8,6 +8,7 @@ Put the three ADTs in their own files.
 """
 
 from gameboard import *
+from graphics import Point
 from random import *
 def main():
     x = input("enter anything")
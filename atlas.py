@@ -0,0 +1,135 @@
+""" Packs the game's PPM tiles into a single atlas image, so the game
+decodes one file at startup instead of one per tile.
+
+Run
+
+    python atlas.py [directory]
+
+to pack every .ppm file in directory (default: the current one) into
+tiles.ppm there, next to an index tiles.txt with one line per tile:
+
+    name x y width height
+
+useAtlas() hands the atlas to a graphics backend (graphics or
+offscreen); Images whose file name is in the index are then drawn
+from their rectangle of the atlas instead of reading the file.
+"""
+
+import os
+import sys
+
+ATLAS_IMAGE = 'tiles.ppm'
+ATLAS_INDEX = 'tiles.txt'
+MAX_WIDTH = 256 # width of the atlas in pixels, tiles are packed in rows
+
+
+def _readPPM(filename):
+    """ Reads a binary (P6) PPM file with 8 bit samples.
+
+        Returns:
+            (width, height, pixel bytes)
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    tokens = []
+    pos = 0
+    while len(tokens) < 4:
+        while data[pos:pos+1].isspace():
+            pos += 1
+        if data[pos:pos+1] == b'#':
+            pos = data.index(b'\n', pos)
+            continue
+        end = pos
+        while not data[end:end+1].isspace():
+            end += 1
+        tokens.append(data[pos:end])
+        pos = end
+    if tokens[0] != b'P6' or int(tokens[3]) != 255:
+        raise ValueError('not a binary PPM file with 8 bit samples: ' + filename)
+    width = int(tokens[1])
+    height = int(tokens[2])
+    pos += 1 # single whitespace before the pixel data
+    return width, height, data[pos:pos + width*height*3]
+
+
+def buildAtlas(directory='.', maxWidth=MAX_WIDTH):
+    """ Packs every .ppm file in directory into ATLAS_IMAGE and writes the
+        rectangles to ATLAS_INDEX in the same directory. Tiles are placed
+        left to right in rows, tallest first.
+
+        Returns:
+            The index as a dictionary of name -> (x, y, width, height)
+    """
+    tiles = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.ppm') and name != ATLAS_IMAGE:
+            width, height, pixels = _readPPM(os.path.join(directory, name))
+            tiles.append((name, width, height, pixels))
+    tiles.sort(key=lambda tile: -tile[2])
+
+    index = {}
+    x = y = rowHeight = atlasWidth = 0
+    for (name, width, height, pixels) in tiles:
+        if x > 0 and x + width > maxWidth: # start a new row
+            x = 0
+            y += rowHeight
+            rowHeight = 0
+        index[name] = (x, y, width, height)
+        x += width
+        rowHeight = max(rowHeight, height)
+        atlasWidth = max(atlasWidth, x)
+    atlasHeight = y + rowHeight
+
+    rows = [bytearray(atlasWidth*3) for i in range(atlasHeight)]
+    for (name, width, height, pixels) in tiles:
+        x, y = index[name][:2]
+        for row in range(height):
+            rows[y + row][x*3:(x + width)*3] = pixels[row*width*3:(row + 1)*width*3]
+
+    with open(os.path.join(directory, ATLAS_IMAGE), 'wb') as f:
+        f.write(('P6\n%d %d\n255\n' % (atlasWidth, atlasHeight)).encode('ascii'))
+        for row in rows:
+            f.write(row)
+    with open(os.path.join(directory, ATLAS_INDEX), 'w') as f:
+        for name in sorted(index):
+            f.write('%s %d %d %d %d\n' % ((name,) + index[name]))
+    return index
+
+
+def readIndex(filename):
+    """ Reads an atlas index file.
+
+        Returns:
+            Dictionary of name -> (x, y, width, height)
+    """
+    index = {}
+    with open(filename) as f:
+        for line in f:
+            fields = line.rsplit(None, 4) # names may contain spaces
+            if len(fields) == 5:
+                index[fields[0]] = tuple(int(n) for n in fields[1:])
+    return index
+
+
+def useAtlas(backend, directory='.'):
+    """ Makes the graphics backend module draw tiles from the atlas in
+        directory, if one has been built there.
+
+        Returns:
+            True if an atlas was found
+    """
+    image = os.path.join(directory, ATLAS_IMAGE)
+    indexFile = os.path.join(directory, ATLAS_INDEX)
+    if not (os.path.exists(image) and os.path.exists(indexFile)):
+        return False
+    backend.loadAtlas(image, readIndex(indexFile))
+    return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        directory = sys.argv[1]
+    else:
+        directory = '.'
+    index = buildAtlas(directory)
+    print('packed %d tiles into %s' % (len(index), os.path.join(directory, ATLAS_IMAGE)))
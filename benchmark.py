@@ -0,0 +1,672 @@
+""" Benchmarks for 'Lost Rovers'. Run all of them with
+
+    python benchmark.py
+
+or name the ones to run:
+
+    python benchmark.py pick_up_latency
+
+Benchmarks that open a game window need a display; the rest drive a
+headless Game. Games and rooms are seeded from SEED, so every run plays
+out the same world.
+"""
+
+import random
+import sys
+import time
+
+BENCHMARKS = []
+SEED = 2015
+
+
+def benchmark(function):
+    """ Registers function as a benchmark that main() can run
+    """
+    BENCHMARKS.append(function)
+    return function
+
+
+def _report(label, timings):
+    """ Prints the mean and worst time of a list of timings in milliseconds
+
+        Args:
+            label: name printed in front of the numbers
+            timings: list of durations in seconds
+    """
+    mean = sum(timings) / len(timings) * 1000
+    worst = max(timings) * 1000
+    print('  %-24s mean %8.3f ms   worst %8.3f ms   (%d runs)'
+          % (label, mean, worst, len(timings)))
+
+
+def _legacy_set_text(text, window, string):
+    """ Updates a Text panel the way GameBoard used to: delete the canvas
+    item and draw a new one, flushing Tk after each step
+    """
+    import graphics
+    text.undraw()
+    graphics.update()
+    text.config["text"] = string
+    text.draw(window)
+    graphics.update()
+
+
+@benchmark
+def pick_up_latency(rounds=200):
+    """ Times GameBoard.do(Game.pickUp) with the old undraw/draw panel
+    update ("before") and with in-place Text.setText ("after")
+
+        Args:
+            rounds: number of pick-ups timed in each mode
+    """
+    from functools import partial
+    from Game import Game, Part
+
+    game = Game(seed=SEED)
+    board = game.gui
+    board.updateGUI()
+    for label, legacy in (('before (undraw/draw)', True), ('after (setText)', False)):
+        for panel in (board.taskWin, board.invWin):
+            if legacy:
+                panel.setText = partial(_legacy_set_text, panel, board.window)
+            else:
+                del panel.setText
+        timings = []
+        for i in range(rounds):
+            x = game.rover.x
+            y = game.rover.y
+            game.room._set_object(x, y, Part(x, y, game.rng))
+            start = time.perf_counter()
+            board.do(game.pickUp)
+            timings.append(time.perf_counter() - start)
+        _report(label, timings)
+    board.quit()
+
+
+@benchmark
+def click_latency(clicks=20, interval=150):
+    """ Times from a click to the end of the screen update, and the CPU
+    used, for the getMouse polling loop and for the event-driven loop
+
+    Clicks are Tk timers on the up button. A timer fires the first time
+    the run loop gives Tk a chance after it is due, just like a real click.
+
+        Args:
+            clicks: number of clicks timed in each mode
+            interval: milliseconds between clicks
+    """
+    from Game import Game
+
+    for label, poll in (('poll (getMouse)', True), ('event (mainloop)', False)):
+        game = Game(seed=SEED)
+        board = game.gui
+        update_gui = board.updateGUI
+        state = {'clicked': False, 'due': 0, 'left': clicks}
+        latencies = []
+
+        def timed_update():
+            update_gui()
+            if state['clicked']:
+                state['clicked'] = False
+                latencies.append(time.perf_counter() - state['due'])
+
+        def click():
+            if state['left'] == 0:
+                board.quit()
+                return
+            state['left'] -= 1
+            state['clicked'] = True
+            board.up.button.invoke()
+            schedule()
+
+        def schedule():
+            state['due'] = time.perf_counter() + interval / 1000
+            board.window.after(interval, click)
+
+        board.updateGUI = timed_update
+        schedule()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        board.run(poll=poll)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        _report(label, latencies)
+        print('  %-24s cpu %5.1f%% of %.1f s' % ('', 100 * cpu / wall, wall))
+
+
+def _legacy_get_image(game, point):
+    """ Looks up the image at point the way Game.getImage used to: by
+    comparing str(item) against each item type
+    """
+    item = game.room.get_object(point.getX(), point.getY())
+    if str(item) == "Part":
+        return item.get_image()
+    elif str(item) == 'Portal':
+        return item.get_image()
+    elif str(item) == 'Ship Component':
+        return item.get_image()
+
+
+@benchmark
+def get_image_sweep(rounds=2000):
+    """ Times a getImage lookup of every cell of the board with the old
+    str(item) dispatch ("before") and with item kinds ("after")
+
+        Args:
+            rounds: number of full-board sweeps timed in each mode
+    """
+    from Game import Game, Position
+
+    game = Game(headless=True, seed=SEED)
+    points = [Position(x, y) for x in range(Game.SIZE) for y in range(Game.SIZE)]
+    for label, getImage in (('before (str dispatch)', lambda point: _legacy_get_image(game, point)),
+                            ('after (item kind)', game.getImage)):
+        assert [getImage(point) for point in points] == [game.getImage(point) for point in points]
+        timings = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            for point in points:
+                getImage(point)
+            timings.append(time.perf_counter() - start)
+        _report(label, timings)
+
+
+def _step_onto_portal(game, back=False, visited=None):
+    """ Puts the rover next to a portal in the current room and returns the
+    move that steps onto it
+
+        Args:
+            game: the Game to drive
+            back: take the portal leading back to the previous room instead
+                of one leading on
+            visited: if given, a set of the seeds of the rooms been to; only
+                a portal to another room is taken, and its seed is added
+        Returns:
+            The Game method (goLeft or goRight) to call, or None if there is
+            no such portal
+    """
+    from Game import PORTAL_KIND
+
+    room = game.room
+    if back:
+        portal = room.linked_portal
+    else:
+        portal = None
+        for (x, y) in room.cells_of_kind(PORTAL_KIND):
+            item = room.get_object(x, y)
+            if item is not room.linked_portal and (
+                    visited == None or item.target_seed not in visited):
+                portal = item
+                break
+    if portal == None:
+        return None
+    if visited != None and not back:
+        visited.add(portal.target_seed)
+    if portal.x > 0:
+        game.rover.x = portal.x - 1
+        move = game.goRight
+    else:
+        game.rover.x = portal.x + 1
+        move = game.goLeft
+    game.rover.y = portal.y
+    return move
+
+
+def _go_deeper(game, visited, do=None):
+    """ Returns the move that takes the rover through a portal into a room
+    it has not been to, searching depth first: from a room with no such
+    portal the rover first goes back until it finds one.
+
+        Args:
+            game: the Game to drive
+            visited: set of the seeds of the rooms been to
+            do: function that makes the moves back, e.g. GameBoard.do;
+                by default they are called directly
+        Returns:
+            The move to call, and the number of rooms gone back through
+        Raises:
+            RuntimeError: no room on the way back has a new room to go to
+    """
+    backs = 0
+    while True:
+        move = _step_onto_portal(game, False, visited)
+        if move != None:
+            return move, backs
+        if game.portal_stack._isEmpty():
+            raise RuntimeError('no room can go any deeper after %d rooms'
+                               % len(visited))
+        move = _step_onto_portal(game, True)
+        if do == None:
+            move()
+        else:
+            do(move)
+        backs += 1
+
+
+@benchmark
+def portal_soak(hops=10000):
+    """ Walks the rover through hops portals, each into a room it has not
+    been to, and checks that every trip through a portal starts at the
+    same Python stack depth
+
+        Args:
+            hops: number of portals to walk through
+    """
+    import inspect
+    from Game import Game
+
+    game = Game(seed=SEED)
+    board = game.gui
+    board.updateGUI()
+    depths = set()
+    travel = game._travel_through_portal
+
+    def recording_travel(portal):
+        depths.add(len(inspect.stack(0)))
+        travel(portal)
+
+    game._travel_through_portal = recording_travel
+    visited = set([game.room_seed])
+    backs = 0
+    start = time.perf_counter()
+    for i in range(hops):
+        move, back = _go_deeper(game, visited, board.do)
+        board.do(move)
+        backs += back
+    elapsed = time.perf_counter() - start
+    board.quit()
+    print('  %d portals (and %d back) in %.1f s, stack depths seen: %s'
+          % (hops, backs, elapsed, sorted(depths)))
+    assert len(depths) == 1, 'stack depth grew while travelling'
+
+
+@benchmark
+def portal_chain(depth=100000):
+    """ Walks the rover until it is depth portals away from the start, each
+    time into a room it has not been to, then all the way back, timing each
+    hop and checking the portal stack empties out again. From a dead end
+    (a room whose only portal leads back) the rover backs up to the last
+    room with a new way on; those hops are counted but not timed. Rooms are
+    not changed on the way, so only the current one is kept and the way
+    back generates each room again from its seed.
+
+        Args:
+            depth: number of portals between the start and the far room
+    """
+    from Game import Game
+
+    game = Game(headless=True, seed=SEED)
+    stack = game.portal_stack
+    visited = set([game.room_seed])
+    timings = []
+    backs = 0
+    while stack._size < depth:
+        move, back = _go_deeper(game, visited)
+        backs += back
+        start = time.perf_counter()
+        move()
+        timings.append(time.perf_counter() - start)
+    _report('out', timings)
+    print('  %-24s %d rooms on the stack, capacity %d, %d rooms kept, %d dead end hops back'
+          % ('', stack._size, stack._capacity, len(game.rooms), backs))
+    assert stack._size == depth, 'portal stack does not match the depth'
+    timings = []
+    for i in range(depth):
+        move = _step_onto_portal(game, True)
+        start = time.perf_counter()
+        move()
+        timings.append(time.perf_counter() - start)
+    _report('back', timings)
+    print('  %-24s %d rooms on the stack, capacity %d, %d rooms kept'
+          % ('', stack._size, stack._capacity, len(game.rooms)))
+    assert stack._isEmpty(), 'portal stack did not empty out'
+
+
+@benchmark
+def offscreen_render(rounds=200, frame_file=None):
+    """ Times drawing the board with the offscreen NumPy backend, with one
+    image per tile and with the composited map layer: a full redraw of a
+    new room and a single move. Needs no display.
+
+        Args:
+            rounds: number of full redraws and of moves timed
+            frame_file: if given, the last frame is saved there as a PPM
+    """
+    import offscreen
+    from Game import Game, Room
+
+    for label, composite in (('tiles', False), ('map layer', True)):
+        game = Game(backend=offscreen, composite_map=composite, seed=SEED)
+        board = game.gui
+        full = []
+        for i in range(rounds):
+            game.room = Room(Game.SIZE, game.rng)
+            start = time.perf_counter()
+            board.updateGUI()
+            full.append(time.perf_counter() - start)
+        _report(label + ': new room', full)
+        moves = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            board.do(game.goUp if i % 2 else game.goDown)
+            moves.append(time.perf_counter() - start)
+        _report(label + ': move', moves)
+        print('  %-24s %d window items' % ('', len(board.window.displayList)))
+        if frame_file:
+            board.window.save(frame_file)
+        board.quit()
+
+
+@benchmark
+def inventory_refresh(rounds=10000):
+    """ Times Game.getInventory() on idle refreshes, after moves and after
+    pick-ups, and counts how often the inventory text was rebuilt
+
+        Args:
+            rounds: number of refreshes timed in each case
+    """
+    from Game import Game, Part
+
+    game = Game(headless=True, seed=SEED)
+    for name in ('Cake', 'Screw', 'Gear', 'Bagel', 'Rug'):
+        game.inventory.add(name, 2)
+    moves = ('up', 'right', 'down', 'left')
+    for label, action in (('idle', None), ('move', 'moves'), ('pick up', 'pick up')):
+        rebuilds = game.inventory.rebuilds
+        timings = []
+        for i in range(rounds):
+            if action == 'moves':
+                game.tick(moves[i % 4])
+            elif action == 'pick up':
+                x = game.rover.x
+                y = game.rover.y
+                game.room._set_object(x, y, Part(x, y, game.rng))
+                game.tick('pick up')
+            start = time.perf_counter()
+            game.getInventory()
+            timings.append(time.perf_counter() - start)
+        _report(label, timings)
+        print('  %-24s %d text rebuilds' % ('', game.inventory.rebuilds - rebuilds))
+
+
+@benchmark
+def queue_scaling(sizes=(1000, 10000, 100000, 1000000)):
+    """ Fills a task Queue to each size and empties it again, printing the
+    cost per enqueue and dequeue; it should stay flat as the size grows
+
+        Args:
+            sizes: queue lengths to try
+    """
+    from Game import Queue
+
+    for size in sizes:
+        queue = Queue()
+        start = time.perf_counter()
+        for i in range(size):
+            queue.enqueue(i)
+        middle = time.perf_counter()
+        for i in range(size):
+            queue.dequeue()
+        end = time.perf_counter()
+        print('  %-24s enqueue %7.1f ns/op   dequeue %7.1f ns/op'
+              % ('%d tasks' % size, (middle - start) / size * 1e9,
+                 (end - middle) / size * 1e9))
+
+
+def _allocated(build):
+    """ Calls build() and returns how many bytes it left allocated, along
+    with what it returned
+    """
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+
+@benchmark
+def memory_report(rooms=500, items=10000):
+    """ Prints the bytes per room and per item with the slotted tile
+    classes, and with subclasses of them that have a __dict__ again, the
+    way the classes used to be. Also prints how much of a room its cell
+    grid and its free-cell and item indexes take.
+
+        Args:
+            rooms: number of rooms generated for the per room figure
+            items: number of parts created for the per item figure
+    """
+    import Game
+
+    slotted = (Game.Portal, Game.Part, Game.ShipComponent)
+    unslotted = tuple(type(cls.__name__, (cls,), {}) for cls in slotted)
+    try:
+        for label, classes in (('before (__dict__)', unslotted),
+                               ('after (__slots__)', slotted)):
+            Game.Portal, Game.Part, Game.ShipComponent = classes
+            rng = random.Random(SEED)
+            per_room, built = _allocated(lambda: [Game.Room(Game.Game.SIZE, rng)
+                                                  for i in range(rooms)])
+            per_item, kept = _allocated(lambda: [Game.Part(0, 0, rng)
+                                                 for i in range(items)])
+            print('  %-24s %8.0f bytes per room   %5.1f bytes per item'
+                  % (label, per_room / rooms, per_item / items))
+    finally:
+        Game.Portal, Game.Part, Game.ShipComponent = slotted
+
+    grid = free = index = 0
+    for room in built:
+        grid += sys.getsizeof(room.room_matrix) + sum(map(sys.getsizeof, room.room_matrix))
+        free += sys.getsizeof(room.free_cells) + sys.getsizeof(room.free_index)
+        index += sys.getsizeof(room.item_cells) + sum(map(sys.getsizeof, room.item_cells.values()))
+    print('  %-24s %8.0f bytes grid   %5.0f free cells   %5.0f item index'
+          % ('of a room', grid / rooms, free / rooms, index / rooms))
+
+
+@benchmark
+def grid_room(rounds=2000):
+    """ Compares Room with the NumPy GridRoom: bytes per room, generating a
+    room, and finding all empty cells and all parts
+
+        Args:
+            rounds: number of rooms generated and queried with each class
+    """
+    from Game import Game, Room, EMPTY, PART_KIND
+    from gridroom import GridRoom
+
+    def room_queries(room):
+        matrix = room.room_matrix
+        empty = [(x, y) for x in range(room_size) for y in range(room_size)
+                 if matrix[x][y] is EMPTY]
+        parts = [(x, y) for x in range(room_size) for y in range(room_size)
+                 if matrix[x][y].kind == PART_KIND]
+        return empty, parts
+
+    def grid_queries(room):
+        return room.empty_cells(), room.cells_of_kind(PART_KIND)
+
+    room_size = Game.SIZE
+    for label, room_type, queries in (('Room', Room, room_queries),
+                                      ('GridRoom', GridRoom, grid_queries)):
+        rng = random.Random(SEED)
+        room_type(room_size, rng) # warm up, e.g. NumPy's allocations
+        size, kept = _allocated(lambda: [room_type(room_size, rng) for i in range(100)])
+        print('  %-24s %8.0f bytes per room' % (label, size / 100))
+        built = []
+        timings = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            built.append(room_type(room_size, rng))
+            timings.append(time.perf_counter() - start)
+        _report(label + ': generate', timings)
+        timings = []
+        for room in built:
+            start = time.perf_counter()
+            queries(room)
+            timings.append(time.perf_counter() - start)
+        _report(label + ': empty + parts', timings)
+
+
+def _legacy_add_item(room, item, rng):
+    """ Puts item in a random empty cell the way Room.add_item used to: by
+    listing every empty cell of the room first
+    """
+    from Game import EMPTY
+
+    empty_room_list = []
+    for x in range(room.size):
+        for y in range(room.size):
+            if room.room_matrix[x][y] is EMPTY:
+                empty_room_list += [[x,y]]
+    x, y = rng.choice(empty_room_list)
+    room._set_object(x, y, item)
+    item.x = x
+    item.y = y
+
+
+@benchmark
+def placement(sizes=(15, 30, 60, 120), rounds=500):
+    """ Times placing an item in a random empty cell of rooms of growing
+    size, by scanning the room ("before") and with the free-cell index
+    ("after"); the index should cost the same at every size
+
+        Args:
+            sizes: room widths to try
+            rounds: number of items placed and removed per size and mode
+    """
+    from Game import Room, Part
+
+    rng = random.Random(SEED)
+    for size in sizes:
+        room = Room(size, rng)
+        for label, add in (('scan', lambda item: _legacy_add_item(room, item, rng)),
+                           ('free cells', lambda item: room.add_item(item, rng))):
+            timings = []
+            for i in range(rounds):
+                part = Part(0, 0, rng)
+                start = time.perf_counter()
+                add(part)
+                timings.append(time.perf_counter() - start)
+                room.remove_item(part)
+            _report('%dx%d %s' % (size, size, label), timings)
+
+
+def _legacy_nearest(room, x, y, kind):
+    """ Finds the item of a kind closest to x, y by scanning every cell of
+    the room
+    """
+    best = None
+    for column in room.room_matrix:
+        for item in column:
+            if item.kind == kind:
+                steps = abs(item.x - x) + abs(item.y - y)
+                if best == None or steps < best_steps:
+                    best = item
+                    best_steps = steps
+    return best
+
+
+@benchmark
+def nearest_item(sizes=(15, 60, 120), rounds=500):
+    """ Times finding the part nearest to a random cell by scanning the
+    room ("scan") and with the room's item index ("index")
+
+        Args:
+            sizes: room widths to try
+            rounds: number of lookups per size and mode
+    """
+    from Game import Room, PART_KIND
+
+    rng = random.Random(SEED)
+    for size in sizes:
+        room = Room(size, rng)
+        cells = [(rng.randrange(size), rng.randrange(size)) for i in range(rounds)]
+        for label, nearest in (('scan', lambda x, y: _legacy_nearest(room, x, y, PART_KIND)),
+                               ('index', lambda x, y: room.nearest(x, y, PART_KIND))):
+            timings = []
+            for (x, y) in cells:
+                start = time.perf_counter()
+                nearest(x, y)
+                timings.append(time.perf_counter() - start)
+            _report('%dx%d %s' % (size, size, label), timings)
+
+
+@benchmark
+def room_store_soak(hops=5000, max_rooms=64):
+    """ Walks the rover hops rooms away from the start, each into a room it
+    has not been to, picking up a part in every room so none of them can
+    simply be dropped, then all the way back. Prints the memory in use as
+    it goes, with every room kept in memory and with a RoomStore of
+    max_rooms, and the store's counters. The set of rooms visited, which
+    only the benchmark needs, is left out of the memory figures and
+    printed on its own, as is the store's index of the spill file.
+
+        Args:
+            hops: number of rooms to walk through before turning back
+            max_rooms: rooms the bounded store keeps in memory
+    """
+    import gc
+    import tracemalloc
+    from Game import Game
+
+    for label, capacity in (('unbounded', hops + 1), ('%d rooms' % max_rooms, max_rooms)):
+        game = Game(headless=True, seed=SEED, max_rooms=capacity)
+        visited = set([game.room_seed])
+        visited_before = sys.getsizeof(visited)
+        tracemalloc.start()
+        memory = []
+        start = time.perf_counter()
+        for i in range(hops):
+            if i % (hops // 5) == 0:
+                gc.collect() # rooms and their portals refer to each other
+                # the seeds in visited are shared with the game, only the
+                # set itself is the benchmark's own
+                memory.append(tracemalloc.get_traced_memory()[0]
+                              - (sys.getsizeof(visited) - visited_before))
+            game.tick('pick up') # marks the room as changed if on a part
+            game.room.modified = True
+            move, backs = _go_deeper(game, visited)
+            move()
+        while not game.portal_stack._isEmpty():
+            _step_onto_portal(game, True)()
+        elapsed = time.perf_counter() - start
+        tracemalloc.stop()
+        print('  %-24s %s kB in use every %d rooms, %.1f s there and back'
+              % (label, ' '.join(['%d' % (size // 1024) for size in memory]),
+                 hops // 5, elapsed))
+        offsets = game.rooms.offsets
+        index = 0
+        if offsets:
+            index = sys.getsizeof(offsets)
+            for seed, entry in offsets.items():
+                index += sys.getsizeof(seed) + sys.getsizeof(entry)
+                index += sum(map(sys.getsizeof, entry))
+        print('  %-24s %d kB visited set (not counted), %d B index per room on disk'
+              % ('', sys.getsizeof(visited) // 1024, index // max(len(offsets), 1)))
+        stats = game.rooms.stats()
+        print('  %-24s %d kB spill file, %d kB of it dead'
+              % ('', (stats['live bytes'] + stats['dead bytes']) // 1024,
+                 stats['dead bytes'] // 1024))
+        print('  %-24s %s' % ('', stats))
+        game.rooms.close()
+
+
+def main(names):
+    """ Runs the benchmarks with the given names, or all of them
+
+        Args:
+            names: list of benchmark function names
+    """
+    for function in BENCHMARKS:
+        if not names or function.__name__ in names:
+            print(function.__name__)
+            function()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -32,30 +32,41 @@ copy of graphics.py as mentioned above.
 
 CREDITS: Original file by Lea Wittie. Bug in quit function fixed by Matt Rogge '17
 """
-from graphics import *
 from functools import partial
-try:  # import as appropriate for 2.x vs. 3.x
-   import tkinter as tk
-except:
-   import mtTkinter as tk
+import atlas
 
 class GameBoard:
     """ A game board of size X size squares with fields for tasks and inventory,
         and many buttons. """
 
     # draw the board
-    def __init__(self, title, game, size, bkColor='Mediumblue', buttonColor='Tan'):
+    def __init__(self, title, game, size, bkColor='Mediumblue', buttonColor='Tan',
+                 backend=None, compositeMap=False):
         """ Takes a title to display on top of the window.
             Takes a game which implements the following methods:
                 goLeft(), goRight(), goUp(), goDown(), showWayBack(), pickUp(), performTask()
+            It may also implement getRoomVersion(), returning the current
+            room and a number that grows with every change to it, and
+            getChangedCells(version), returning the (x, y) cells changed
+            since that version or None if it doesn't know. With them only
+            the changed cells are redrawn; without them the whole map is.
             Color options: http://packages.python.org/ete2/reference/reference_svgcolors.html    
+            Takes the graphics module to draw with. The default is graphics
+            (a Tk window); offscreen draws into an image in memory instead.
+            With compositeMap the map is drawn as one image (see MapLayer)
+            instead of one image per tile. This needs NumPy.
         """
+        if backend == None:
+            import graphics as backend
+        self.gfx = gfx = backend
+        atlas.useAtlas(gfx) # one decode for all tiles, if the atlas was built
         width = 650
         height = 600
         self.size = size
 
         self.game = game 
-        self.window = GraphWin(title, width, height)
+        self.window = gfx.GraphWin(title, width, height)
+        self.window.setCloseHandler(self.quit)
         self.window.setBackground(bkColor)
 
         sideOffset = 10  # offset from sides
@@ -71,13 +82,13 @@ class GameBoard:
         # top left is Task Window
         taskX = sideOffset
         taskY = sideOffset
-        taskLabel = Text(Point(taskX, taskY), "Task")
+        taskLabel = gfx.Text(gfx.Point(taskX, taskY), "Task")
         taskLabel.setStyle('bold')
         taskLabel.draw(self.window)
-        taskRect = Rectangle(Point(taskX, taskY + lineSpace), Point(taskX + taskWidth, taskY + lineSpace + taskHeight))
+        taskRect = gfx.Rectangle(gfx.Point(taskX, taskY + lineSpace), gfx.Point(taskX + taskWidth, taskY + lineSpace + taskHeight))
         taskRect.setFill("white")
         taskRect.draw(self.window)
-        self.taskWin = Text(Point(taskX + boxOffset, taskY + lineSpace + boxOffset), " ")
+        self.taskWin = gfx.Text(gfx.Point(taskX + boxOffset, taskY + lineSpace + boxOffset), " ")
         self.taskWin.draw(self.window)
 
         # bottom left is Room Map
@@ -85,25 +96,32 @@ class GameBoard:
         mapY = sideOffset + lineSpace + taskHeight + lineSpace
         self.mapRectX = mapX
         self.mapRectY = mapY + lineSpace
-        mapLabel = Text(Point(mapX, mapY), "Map of room")
+        mapLabel = gfx.Text(gfx.Point(mapX, mapY), "Map of room")
         mapLabel.setStyle('bold')
         mapLabel.draw(self.window)
-        self.mapRect = Rectangle(Point(mapX, mapY + lineSpace),
-                            Point(mapX + self.mapSize,
+        self.mapRect = gfx.Rectangle(gfx.Point(mapX, mapY + lineSpace),
+                            gfx.Point(mapX + self.mapSize,
                                   mapY + lineSpace + self.mapSize))
         self.mapRect.setFill("white")
         self.mapRect.draw(self.window)
+        self.mapLayer = None
+        if compositeMap:
+            self.mapLayer = MapLayer(gfx, self.window, self.mapRectX, self.mapRectY,
+                                     self.size, self.mapSize//self.size)
+            # keep the map's outline visible on top of the layer
+            self.mapRect.setFill("")
+            self.window.tag_raise(self.mapRect.id)
 
         # top right is Inventory
         invX = width - sideOffset - invWidth
         invY = sideOffset
-        invLabel = Text(Point(invX, invY), "Inventory")
+        invLabel = gfx.Text(gfx.Point(invX, invY), "Inventory")
         invLabel.setStyle('bold')
         invLabel.draw(self.window)
-        invRect = Rectangle(Point(invX, invY + lineSpace), Point(invX + invWidth, invY + lineSpace + invHeight))
+        invRect = gfx.Rectangle(gfx.Point(invX, invY + lineSpace), gfx.Point(invX + invWidth, invY + lineSpace + invHeight))
         invRect.setFill("white")
         invRect.draw(self.window)
-        self.invWin = Text(Point(invX + boxOffset, invY + lineSpace + boxOffset), " ")
+        self.invWin = gfx.Text(gfx.Point(invX + boxOffset, invY + lineSpace + boxOffset), " ")
         self.invWin.draw(self.window)
 
         # bottom right is buttons
@@ -113,22 +131,22 @@ class GameBoard:
 
 
 
-        self.up = Button(Point(buttonX + buttonWidth/2, buttonY),
+        self.up = gfx.Button(gfx.Point(buttonX + buttonWidth/2, buttonY),
                          "^", partial(self.do, self.game.goUp), buttonColor)
         self.up.draw(self.window)
 
 
-        self.down = Button(Point(buttonX + buttonWidth/2, buttonY + lineSpace*2),
+        self.down = gfx.Button(gfx.Point(buttonX + buttonWidth/2, buttonY + lineSpace*2),
                            "V", partial(self.do, self.game.goDown), buttonColor)
         self.down.draw(self.window)
 
 
-        self.left = Button(Point(buttonX + buttonWidth*3/8, buttonY + lineSpace),
+        self.left = gfx.Button(gfx.Point(buttonX + buttonWidth*3/8, buttonY + lineSpace),
                            "<--", partial(self.do, self.game.goLeft), buttonColor)
         self.left.draw(self.window)
 
 
-        self.right = Button(Point(buttonX + buttonWidth*5/8, buttonY + lineSpace),
+        self.right = gfx.Button(gfx.Point(buttonX + buttonWidth*5/8, buttonY + lineSpace),
                             "-->", partial(self.do, self.game.goRight), buttonColor)
         self.right.draw(self.window)
 
@@ -137,25 +155,30 @@ class GameBoard:
 
 
 
-        self.wayBack = Button(Point(buttonX + buttonWidth/2, buttonY + lineSpace*4),
+        self.wayBack = gfx.Button(gfx.Point(buttonX + buttonWidth/2, buttonY + lineSpace*4),
                               "Show the way back",
                               partial(self.do, self.game.showWayBack), buttonColor)
         self.wayBack.draw(self.window)
-        self.pickUp = Button(Point(buttonX + buttonWidth*1/4, buttonY + lineSpace*6),
+        self.pickUp = gfx.Button(gfx.Point(buttonX + buttonWidth*1/4, buttonY + lineSpace*6),
                              "Pick up",
                              partial(self.do, self.game.pickUp), buttonColor)
         self.pickUp.draw(self.window)
-        self.performTask = Button(Point(buttonX + buttonWidth*3/4, buttonY + lineSpace*6),
+        self.performTask = gfx.Button(gfx.Point(buttonX + buttonWidth*3/4, buttonY + lineSpace*6),
                                   "Perform task",
                                   partial(self.do, self.game.performTask), buttonColor)
         self.performTask.draw(self.window)
-        self.quit = Button(Point(buttonX + buttonWidth*1/4, buttonY + lineSpace*8),
+        self.quitButton = gfx.Button(gfx.Point(buttonX + buttonWidth*1/4, buttonY + lineSpace*8),
                            "Quit", self.quit, buttonColor)
-        self.quit.draw(self.window)
-        self.help = Button(Point(buttonX + buttonWidth*3/4, buttonY + lineSpace*8),
+        self.quitButton.draw(self.window)
+        self.help = gfx.Button(gfx.Point(buttonX + buttonWidth*3/4, buttonY + lineSpace*8),
                            "Help", self.nothing, buttonColor)
         self.help.draw(self.window)
 
+        self.rover = None # persistent rover sprite, moved between cells
+        self.drawnRoom = None # room the map last showed, and its version then
+        self.drawnVersion = 0
+        self.taskText = None # text last shown in the task field
+        self.invText = None  # text last shown in the inventory field
         self.images = []
         for x in range(self.size):
             self.images.append([])
@@ -175,103 +198,146 @@ class GameBoard:
         if self.isUpdating:
             return
         
-        fncn()
-        self.updateGUI()
+        with self.window.frame():
+            fncn()
+            self.updateGUI()
 
     def updateGUI(self):
-        """ Update the GUI (tasks, inventory, grid) """
+        """ Update the GUI (tasks, inventory, grid). All drawing is done in
+            one window frame so Tk is flushed once at the end. """
+        with self.window.frame():
+            self._updateGUI()
+
+    def _updateGUI(self):
+        gfx = self.gfx
         self.isUpdating = True
         
         tileLength = self.mapSize//self.size
+        loc = self.game.getRoverLocation()
 
-        # Update the stuff on the grid (items, portals, ship components)
-        for x in range(self.size):
-            for y in range(self.size):
-                image = self.game.getImage(Point(x,y))
-                               
-                # if image was in location and has changed or gone, erase it
-                if self.images[x][y] != None and self.images[x][y].getImage()!=image:
-                    self.images[x][y].undraw()
-                
-                # if image is now there and wasn't before
-                if image != None and self.images[x][y] == None:
-                    i = Image(Point(self.mapRectX + x*tileLength + tileLength//2,
-                                     self.mapRectY + y*tileLength + tileLength//2),
-                            tileLength,tileLength)
-                    i.setImage(image)
-                    i.draw(self.window)
-                    self.images[x][y] = i
-
-                # if image was there and has changed
-                elif image != None and self.images[x][y] != None and self.images[x][y].getImage()!=image:
-                    self.images[x][y].setImage(image)
-                    self.images[x][y].draw(self.window)
-                
-                # if now gone
-                elif image == None and self.images[x][y] != None:
-                    self.images[x][y] = None
-
-                # error checking.. nothing should print
-                elif image == None and self.images[x][y] == None:
-                    pass
-                elif self.images[x][y] != None and image == self.images[x][y].getImage():
-                    pass
-                else:
-                    string = '['+str(x)+']['+str(y)+'] image:' + str(image) + ', stored image:'
-                    if self.images[x][y] == None:
-                        string += 'None'
-                    else:
-                        string += self.images[x][y].getImage()
-                    print(string)
+        # Update the stuff on the grid (items, portals, ship components).
+        # Only the cells changed since the map was last drawn are looked at;
+        # another room means a full redraw.
+        cells = None
+        getRoomVersion = getattr(self.game, 'getRoomVersion', None)
+        if getRoomVersion != None:
+            room, version = getRoomVersion()
+            if room is self.drawnRoom:
+                cells = self.game.getChangedCells(self.drawnVersion)
+            self.drawnRoom = room
+            self.drawnVersion = version
+        full = cells == None
+        if full:
+            cells = [(x, y) for x in range(self.size) for y in range(self.size)]
+        newTiles = False
+        if self.mapLayer != None:
+            tiles = [(x, y, self.game.getImage(gfx.Point(x,y))) for (x, y) in cells]
+            self.mapLayer.update(tiles, full)
+        else:
+            for (x, y) in cells:
+                if self.updateTile(x, y, tileLength):
+                    newTiles = True
                 
-        # Update the rover
+        # Update the rover. The sprite is kept between updates and only
+        # moved, or given a new picture when the game's rover image changes.
         rover = self.game.getRoverImage()
-        loc = self.game.getRoverLocation()
-        try: # decently non-flickery
-            self.rover.undraw()
-        except Exception:
-            pass
-        if loc != None and rover != None:
-            self.rover = Image(Point(self.mapRectX + loc.x*tileLength + tileLength//2,
-                                     self.mapRectY + loc.y*tileLength + tileLength//2),
-                               tileLength,tileLength)
-            self.rover.setImage(rover)
-            self.rover.draw(self.window)
-
-        # Update the task field
+        if loc == None or rover == None:
+            if self.rover != None:
+                self.rover.undraw()
+                self.rover = None
+        else:
+            roverX = self.mapRectX + loc.x*tileLength + tileLength//2
+            roverY = self.mapRectY + loc.y*tileLength + tileLength//2
+            if self.rover == None:
+                self.rover = gfx.Image(gfx.Point(roverX, roverY), rover)
+                self.rover.draw(self.window)
+            else:
+                if self.rover.getImage() != rover:
+                    self.rover.setImage(rover)
+                anchor = self.rover.getAnchor()
+                if anchor.x != roverX or anchor.y != roverY:
+                    self.rover.move(roverX - anchor.x, roverY - anchor.y)
+                if newTiles: # keep the rover above tiles drawn after it
+                    self.window.tag_raise(self.rover.id)
+
+        # Update the task field (in place, and only if the text changed)
         taskText = self.game.getCurrentTask()
-        oldTaskText = self.taskWin.config["text"]
-        if taskText != None and taskText != oldTaskText:
-            self.taskWin.undraw()
-            self.taskWin.config["text"] = taskText
-            self.taskWin.draw(self.window)
+        if taskText != None and taskText != self.taskText:
+            self.taskText = taskText
+            self.taskWin.setText(taskText)
 
         # Update the inventory field
         invText = self.game.getInventory()
-        oldInvText = self.invWin.config["text"]
-        if invText != None and invText != oldInvText:
-            self.invWin.undraw()
-            self.invWin.config["text"] = invText
-            self.invWin.draw(self.window)
+        if invText != None and invText != self.invText:
+            self.invText = invText
+            self.invWin.setText(invText)
 
         self.isUpdating = False
         
+    def updateTile(self, x, y, tileLength):
+        """ Redraw the map cell at x,y if its image changed. Returns True if
+            a new canvas item was drawn for the cell. """
+        gfx = self.gfx
+        image = self.game.getImage(gfx.Point(x,y))
+                       
+        # if image was in location and has changed or gone, erase it
+        if self.images[x][y] != None and self.images[x][y].getImage()!=image:
+            self.images[x][y].undraw()
+        
+        # if image is now there and wasn't before
+        if image != None and self.images[x][y] == None:
+            i = gfx.Image(gfx.Point(self.mapRectX + x*tileLength + tileLength//2,
+                             self.mapRectY + y*tileLength + tileLength//2),
+                    image)
+            i.draw(self.window)
+            self.images[x][y] = i
+            return True
+
+        # if image was there and has changed
+        elif image != None and self.images[x][y] != None and self.images[x][y].getImage()!=image:
+            self.images[x][y].setImage(image)
+            self.images[x][y].draw(self.window)
+            return True
+        
+        # if now gone
+        elif image == None and self.images[x][y] != None:
+            self.images[x][y] = None
+
+        # error checking.. nothing should print
+        elif image == None and self.images[x][y] == None:
+            pass
+        elif self.images[x][y] != None and image == self.images[x][y].getImage():
+            pass
+        else:
+            string = '['+str(x)+']['+str(y)+'] image:' + str(image) + ', stored image:'
+            if self.images[x][y] == None:
+                string += 'None'
+            else:
+                string += self.images[x][y].getImage()
+            print(string)
+
     def nothing(self):
         """ Called by the help button. Could be replaced by a function
             that actually does something. """
         print('help button click')
 
-    def run(self):
-        """ Repeatedly wait for a click.. Keeps the game running. """
+    def run(self, poll=False):
+        """ Keeps the game running until quit is called. Tk's event loop
+            calls the buttons as soon as they are clicked and sleeps while
+            nothing happens. With poll=True the old loop that repeatedly
+            waits for a click with getMouse is used instead. """
         self.updateGUI()
         self.shouldRun = True
 
-        
-        while(self.shouldRun):
-            try:
-                pt = self.window.getMouse()
-            except Exception:
-                pass
+        if poll:
+            while(self.shouldRun):
+                try:
+                    pt = self.window.getMouse()
+                except Exception:
+                    pass
+        else:
+            while self.shouldRun and not self.window.isClosed():
+                self.window.mainloop()
 
     def quit(self):
         """ Called by the quit button. Closes the window and forces the run
@@ -279,4 +345,85 @@ class GameBoard:
         """
         self.window.close()
         self.shouldRun = False
-   
+        self.window.quit() # leave Tk's event loop
+
+
+class MapLayer:
+    """ The map of the room drawn as a single image. The tiles are composited
+        into an RGB array with NumPy and the array is copied into one image
+        per update, so the window holds one map item instead of one per tile.
+        A tile is centered in its cell and cut off at the cell's edges. """
+
+    def __init__(self, gfx, window, x, y, size, tileLength):
+        """ Draws an empty map of size X size cells with its top left corner
+            at x,y in the window. """
+        import numpy
+        import offscreen # for its PPM decoder
+        if gfx != offscreen:
+            atlas.useAtlas(offscreen)
+        self.numpy = numpy
+        self.tileCache = offscreen.Image.photoCache
+        self.size = size
+        self.tileLength = tileLength
+        mapSize = size*tileLength
+        self.pixels = numpy.empty((mapSize, mapSize, 3), numpy.uint8)
+
+        # every image name gets a cell-sized picture; 0 is an empty cell
+        empty = numpy.full((tileLength, tileLength, 3), 255, numpy.uint8)
+        self.cells = [empty]
+        self.cellStack = None # self.cells as one array, made when needed
+        self.cellIds = {None: 0}
+        self.ids = numpy.zeros((size, size), numpy.intp) # [y, x] -> cell id
+        self.pixels[:] = 255
+
+        self.image = gfx.Image(gfx.Point(x + mapSize//2, y + mapSize//2),
+                               mapSize, mapSize)
+        self.image.putArray(self.pixels)
+        self.image.draw(window)
+
+    def cellId(self, name):
+        """ Returns the id of the cell picture for the image name, making the
+            picture the first time the name is seen. """
+        id = self.cellIds.get(name)
+        if id == None:
+            tile = self.tileCache.get(name)
+            cell = self.cells[0].copy()
+            length = self.tileLength
+            # place the tile as if it were centered on the middle of the cell
+            top = length//2 - tile.shape[0]//2
+            left = length//2 - tile.shape[1]//2
+            y1, y2 = max(top, 0), min(top + tile.shape[0], length)
+            x1, x2 = max(left, 0), min(left + tile.shape[1], length)
+            cell[y1:y2, x1:x2] = tile[y1-top:y2-top, x1-left:x2-left]
+            id = len(self.cells)
+            self.cells.append(cell)
+            self.cellIds[name] = id
+            self.cellStack = None
+        return id
+
+    def update(self, tiles, full):
+        """ Draws the given (x, y, image name) tiles and copies the map into
+            its image once. If full, tiles lists every cell and the whole map
+            is rebuilt in one step. """
+        ids = self.ids
+        length = self.tileLength
+        changed = []
+        for (x, y, name) in tiles:
+            id = self.cellId(name)
+            if ids[y, x] != id:
+                ids[y, x] = id
+                changed.append((x, y, id))
+        if full:
+            if self.cellStack is None:
+                self.cellStack = self.numpy.stack(self.cells)
+            # (y, x, row, col, rgb) -> (y, row, x, col, rgb) -> map rows
+            mapSize = self.size*length
+            self.pixels[:] = self.cellStack[ids].transpose(0, 2, 1, 3, 4).reshape(
+                mapSize, mapSize, 3)
+        elif changed:
+            for (x, y, id) in changed:
+                self.pixels[y*length:(y+1)*length, x*length:(x+1)*length] = self.cells[id]
+        else:
+            return
+        self.image.putArray(self.pixels)
+
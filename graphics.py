@@ -65,6 +65,18 @@ Programming: An Introduction to Computer Science" by John Zelle,
 published by Franklin, Beedle & Associates.  Also see
 http://mcsp.wartburg.edu/zelle/python for a quick reference"""
 
+# Version 4.3
+#     * Image shares decoded PhotoImages through a bounded cache keyed by
+#       file name (see ImageCache, imageCacheStats, invalidateImageCache)
+#     * Added GraphWin.frame (and beginFrame/endFrame) to batch the
+#       autoflush updates of many drawing calls into one
+#     * Image.setImage on a drawn Image swaps the picture in place
+#     * _reconfig sends only the changed option to Tk, so Text.setText
+#       is a cheap in-place update
+#     * Added GraphWin.setCloseHandler
+#     * Added Image.putArray to show an RGB array (e.g. from NumPy)
+#     * Added loadAtlas: Images named in an atlas index are cut from one
+#       decoded atlas image instead of reading their own files
 # Version 4.2 5/26/2011
 #     * Modified Image to allow multiple undraws like other GraphicsObjects
 # Version 4.1 12/29/2009
@@ -156,6 +168,7 @@ http://mcsp.wartburg.edu/zelle/python for a quick reference"""
 #     Button should really be using the tk Button but it doesnt
 
 import time, os, sys
+from contextlib import contextmanager
 
 print("Importing mtTkinter")
 # Thread-safe version of tkinter
@@ -209,6 +222,10 @@ class GraphWin(tk.Canvas):
         self._mouseCallback = None
         self.trans = None
         self.closed = False
+        self.updateCount = 0      # Tk updates issued by drawing calls
+        self.frameDepth = 0       # nesting level of open frames
+        self.frameUpdates = 0     # Tk updates issued by the last frame
+        self.frameDeferred = 0    # autoflushes held back by the last frame
         master.lift()
         if autoflush: _root.update()
      
@@ -245,8 +262,52 @@ class GraphWin(tk.Canvas):
 
 
     def __autoflush(self):
-        if self.autoflush:
+        self._autoUpdate()
+
+    def _autoUpdate(self):
+        # Called after every change to the window. Inside a frame the
+        # update is held back until endFrame.
+        if self.frameDepth:
+            self._deferred = self._deferred + 1
+        elif self.autoflush:
             _root.update()
+            self.updateCount = self.updateCount + 1
+
+    def beginFrame(self):
+        """Start batching drawing calls. Nothing is flushed to the screen
+        until the matching endFrame. Frames may be nested."""
+        if self.frameDepth == 0:
+            self._deferred = 0
+            self._frameStart = self.updateCount
+        self.frameDepth = self.frameDepth + 1
+
+    def endFrame(self):
+        """Finish a frame started by beginFrame. The outermost endFrame
+        does a single update_idletasks for everything drawn in the frame.
+        Returns the number of Tk updates the frame issued."""
+        if self.frameDepth == 0:
+            raise GraphicsError("endFrame without beginFrame")
+        self.frameDepth = self.frameDepth - 1
+        if self.frameDepth == 0:
+            if not self.closed:
+                self.update_idletasks()
+                self.updateCount = self.updateCount + 1
+            self.frameUpdates = self.updateCount - self._frameStart
+            self.frameDeferred = self._deferred
+        return self.frameUpdates
+
+    @contextmanager
+    def frame(self):
+        """Context manager for beginFrame/endFrame:
+
+            with win.frame():
+                ... draw, move and undraw objects ...
+        """
+        self.beginFrame()
+        try:
+            yield self
+        finally:
+            self.endFrame()
 
     
     def plot(self, x, y, color="black"):
@@ -325,6 +386,10 @@ class GraphWin(tk.Canvas):
         
     def setMouseHandler(self, func):
         self._mouseCallback = func
+
+    def setCloseHandler(self, func):
+        """Call func instead of close when the window's close box is clicked"""
+        self.master.protocol("WM_DELETE_WINDOW", func)
         
     def _onClick(self, e):
         self.mouseX = e.x
@@ -416,8 +481,7 @@ class GraphicsObject:
         if graphwin.isClosed(): raise GraphicsError("Can't draw to closed window")
         self.canvas = graphwin
         self.id = self._draw(graphwin, self.config)
-        if graphwin.autoflush:
-            _root.update()
+        graphwin._autoUpdate()
 
             
     def undraw(self):
@@ -428,8 +492,7 @@ class GraphicsObject:
         if not self.canvas: return
         if not self.canvas.isClosed():
             self.canvas.delete(self.id)
-            if self.canvas.autoflush:
-                _root.update()
+            self.canvas._autoUpdate()
         self.canvas = None
         self.id = None
 
@@ -450,8 +513,7 @@ class GraphicsObject:
                 x = dx
                 y = dy
             self.canvas.move(self.id, x, y)
-            if canvas.autoflush:
-                _root.update()
+            canvas._autoUpdate()
            
     def _reconfig(self, option, setting):
         # Internal method for changing configuration of the object
@@ -459,12 +521,10 @@ class GraphicsObject:
         #    dictionary for this object
         if option not in self.config:
             raise GraphicsError(UNSUPPORTED_METHOD)
-        options = self.config
-        options[option] = setting
+        self.config[option] = setting
         if self.canvas and not self.canvas.isClosed():
-            self.canvas.itemconfig(self.id, options)
-            if self.canvas.autoflush:
-                _root.update()
+            self.canvas.itemconfig(self.id, {option: setting})
+            self.canvas._autoUpdate()
 
 
     def _draw(self, canvas, options):
@@ -828,32 +888,124 @@ class Entry(GraphicsObject):
         if self.entry:
             self.entry.config(fg=color)
 
+class ImageCache:
+
+    """Bounded cache of decoded tk photoimages keyed by file name.
+
+    Every Image loaded from a file draws from the shared cache, so a file
+    is read and decoded once no matter how many Images display it. When
+    more than capacity files are cached the least recently used one is
+    dropped; Images still holding it keep it alive until they change.
+
+    If an atlas is loaded, names found in its index are copied out of the
+    atlas photoimage instead of being read from their files. A canvas
+    needs a photoimage per picture, so each name still gets its own
+    small copy, but the atlas file is the only one decoded."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.photos = {} # file name -> photoimage, oldest use first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.atlas = None       # decoded atlas photoimage
+        self.atlasIndex = {}    # file name -> (x, y, width, height) in atlas
+        self.atlasFile = None
+
+    def get(self, filename):
+        """Return the decoded photoimage for filename"""
+        photo = self.photos.pop(filename, None)
+        if photo is None:
+            self.misses = self.misses + 1
+            rect = self.atlasIndex.get(filename)
+            if rect:
+                x, y, width, height = rect
+                photo = tk.PhotoImage(master=_root, width=width, height=height)
+                photo.tk.call(photo, "copy", self.atlas,
+                              "-from", x, y, x + width, y + height)
+            else:
+                photo = tk.PhotoImage(file=filename, master=_root)
+            while len(self.photos) >= self.capacity:
+                del self.photos[next(iter(self.photos))]
+                self.evictions = self.evictions + 1
+        else:
+            self.hits = self.hits + 1
+        self.photos[filename] = photo # re-insert as most recently used
+        return photo
+
+    def loadAtlas(self, filename, index):
+        """Decode the atlas image filename. index maps file names to
+        their (x, y, width, height) rectangle in the atlas."""
+        if filename == self.atlasFile and index == self.atlasIndex:
+            return # already loaded
+        self.atlas = tk.PhotoImage(file=filename, master=_root)
+        self.atlasIndex = dict(index)
+        self.atlasFile = filename
+        self.invalidate()
+
+    def invalidate(self, filename=None):
+        """Forget the cached photoimage for filename (all of them if None)
+        so the next use reads the file again"""
+        if filename is None:
+            self.photos.clear()
+        else:
+            self.photos.pop(filename, None)
+
+    def stats(self):
+        """Return a dictionary of the cache counters"""
+        return {"size": len(self.photos), "capacity": self.capacity,
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
 class Image(GraphicsObject):
 
     idCount = 0
     imageCache = {} # tk photoimages go here to avoid GC while drawn 
+    photoCache = ImageCache() # decoded photoimages shared by file name
     
     def __init__(self, p, *pixmap):
         GraphicsObject.__init__(self, [])
         self.anchor = p.clone()
         self.imageId = Image.idCount
         Image.idCount = Image.idCount + 1
-        if len(pixmap) == 1: # file name provided
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
-        else: # width and height provided
-            width, height = pixmap
-            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+        self._setPhoto(pixmap)
 
     def setImage(self, *pixmap):
+        self._setPhoto(pixmap)
+        if self.canvas and not self.canvas.isClosed():
+            # already drawn: point the existing canvas item at the new picture
+            self.imageCache[self.imageId] = self.img
+            self.canvas.itemconfig(self.id, image=self.img)
+            self.canvas._autoUpdate()
+
+    def _setPhoto(self, pixmap):
         if len(pixmap) == 1: # file name provided
             self.imageName = pixmap[0]
-            self.img = tk.PhotoImage(file=pixmap[0], master=_root)
+            self.img = Image.photoCache.get(pixmap[0])
+            self.shared = True
         else: # width and height provided
+            self.imageName = None
             width, height = pixmap
             self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.shared = False
 
     def getImage(self):
        return self.imageName
+
+    def putArray(self, pixels):
+        """Replace the picture with pixels, a height x width x 3 array of
+        uint8 such as a NumPy array"""
+        height, width = pixels.shape[:2]
+        header = ("P6\n%d %d\n255\n" % (width, height)).encode("ascii")
+        if self.shared: # never write into a photoimage from the cache
+            self.img = tk.PhotoImage(master=_root, width=width, height=height)
+            self.shared = False
+            if self.id:
+                self.imageCache[self.imageId] = self.img
+                self.canvas.itemconfig(self.id, image=self.img)
+        self.img.configure(data=header + pixels.tobytes(), format="PPM")
+        if self.canvas and not self.canvas.isClosed():
+            self.canvas._autoUpdate()
       
     def _draw(self, canvas, options):
         p = self.anchor
@@ -905,6 +1057,12 @@ class Image(GraphicsObject):
         """Sets pixel (x,y) to the given color
         
         """
+        if self.shared: # copy on write so other Images keep the file's pixels
+            self.img = self.img.copy()
+            self.shared = False
+            if self.id:
+                self.imageCache[self.imageId] = self.img
+                self.canvas.itemconfig(self.id, image=self.img)
         self.img.put("{" + color +"}", (x, y))
         
 
@@ -919,6 +1077,19 @@ class Image(GraphicsObject):
         self.img.write( filename, format=ext)
 
         
+def imageCacheStats():
+    """Return the hit, miss and eviction counters of the shared image cache"""
+    return Image.photoCache.stats()
+
+def invalidateImageCache(filename=None):
+    """Drop filename (or every file if None) from the shared image cache"""
+    Image.photoCache.invalidate(filename)
+
+def loadAtlas(filename, index):
+    """Draw Images whose file name is in index (name -> (x, y, width,
+    height)) from that rectangle of the atlas image filename"""
+    Image.photoCache.loadAtlas(filename, index)
+
 def color_rgb(r,g,b):
     """r,g,b are intensities of red, green, and blue in range(256)
     Returns color specifier string for the resulting color"""
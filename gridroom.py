@@ -0,0 +1,304 @@
+""" A Room for 'Lost Rovers' stored as a NumPy grid.
+
+Every cell of a GridRoom is a small integer tile id in a uint8 array; the
+id says which image the cell shows, and through that what kind of item is
+there. Parts and ship components have no state besides their image (a
+broken component shows a broken image), so they live only in the grid.
+Only portals, which link rooms, are also kept in a side table by cell. A
+15x15 room is then 225 bytes of tiles plus two portals, and questions about
+the whole room are single array operations.
+
+Use it with
+
+    Game(room_type=GridRoom)
+"""
+
+import random
+
+import numpy
+
+from Game import (EMPTY, EMPTY_KIND, PART_KIND, PORTAL_KIND,
+                  SHIP_COMPONENT_KIND, Room, Part, Portal, ShipComponent)
+
+PART_IMAGES = ('cake.ppm', 'lettuce.ppm', 'screw.ppm', 'bagel.ppm', 'gear.ppm')
+
+# Tile id -> image name and item kind. Id 0 is an empty cell; other images
+# get an id the first time a room shows them. The game has a dozen or so
+# images, so a byte per cell is plenty.
+TILE_DTYPE = numpy.uint8
+TILE_IMAGES = [None]
+TILE_KINDS = [EMPTY_KIND]
+_tileIds = {}
+_kindArray = numpy.array(TILE_KINDS, numpy.int16)
+
+
+def tile_id(image, kind):
+    """ Returns the tile id for an image, registering the image if it is new
+
+        Args:
+            image: the image name, e.g. 'cake.ppm'
+            kind: the kind of item that shows this image
+    """
+    global _kindArray
+    tile = _tileIds.get(image)
+    if tile == None:
+        tile = len(TILE_IMAGES)
+        if tile > numpy.iinfo(TILE_DTYPE).max:
+            raise ValueError("too many tile images for a GridRoom")
+        _tileIds[image] = tile
+        TILE_IMAGES.append(image)
+        TILE_KINDS.append(kind)
+        _kindArray = numpy.array(TILE_KINDS, numpy.int16)
+    return tile
+
+
+PART_TILES = numpy.array([tile_id(image, PART_KIND) for image in PART_IMAGES],
+                         TILE_DTYPE)
+
+
+# Item kind -> class of the items a GridRoom makes on demand
+_ITEM_CLASSES = {PART_KIND: Part, SHIP_COMPONENT_KIND: ShipComponent}
+
+
+def _make_item(kind, x, y, image):
+    """ Returns a part or ship component at x, y showing the given image.
+    These are not stored in a GridRoom, so get_object makes one when it is
+    asked for one.
+    """
+    item_class = _ITEM_CLASSES[kind]
+    item = item_class.__new__(item_class)
+    item.x = x
+    item.y = y
+    item.image = image
+    return item
+
+
+class GridRoom(Room):
+    """A Room stored as a grid of tile ids plus the room's portals.
+
+    Works anywhere a Room does. The room_matrix attribute is a read-only
+    list of lists built on demand, for code that walks every cell. Parts
+    and ship components are made fresh each time they are asked for, so
+    change them through the room (e.g. toggle_broken), not by keeping them.
+
+    Attributes:
+        self.size: The width and height of the room
+        self.tiles: uint8 array, tiles[x, y] is the tile id of that cell
+        self.portals: List of the portals in the room; there are only a
+            few, so they are looked up by walking the list
+        self.version, self.changes, self.change_base: The cells changed
+            lately, as in Room
+    """
+    PORTAL_COUNT = 2
+    PART_COUNT = 9
+    COMPONENT_COUNT = 10
+
+    def __init__(self, size, rng = None):
+        if rng == None:
+            rng = random
+        # every attribute is set before populating, always in the same
+        # order, so all rooms share one attribute key table
+        self.size = size
+        self.tiles = self._initalize_room(size)
+        self.portals = []
+        self.version = 0
+        self.change_base = 0
+        self.changes = None
+        self.linked_portal = None
+        self.modified = False
+        self._populate_room(rng)
+        self.version = 0 # a new room is always drawn in full
+        self.changes = None
+        self.modified = False
+
+    @property
+    def room_matrix(self):
+        """ The room as a list of lists of objects, room_matrix[x][y]
+        """
+        return [[self.get_object(x, y) for y in range(self.size)]
+                for x in range(self.size)]
+
+    def _populate_room(self, rng):
+        """ Populates the room like Room does, a whole grid of choices at a time:
+        every cell draws a number from 1 to 21, and the first cells (in the
+        order Room fills them) that drew 1, 2 or 3 get a portal, a part or
+        a ship component, up to the same maximum counts. Ship components go
+        to random cells in the center and replace whatever is there.
+
+            Args:
+                rng: the random generator to populate the room with; the
+                    grids of choices come from a NumPy generator seeded
+                    from it
+        """
+        size = self.size
+        grid_rng = numpy.random.default_rng(rng.getrandbits(64))
+        choices = grid_rng.integers(1, 22, size=size*size)
+        parts = numpy.flatnonzero(choices == 2)[:GridRoom.PART_COUNT]
+        self.tiles.flat[parts] = PART_TILES[
+            grid_rng.integers(0, len(PART_TILES), size=len(parts))]
+
+        for cell in numpy.flatnonzero(choices == 1)[:GridRoom.PORTAL_COUNT]:
+            x, y = divmod(int(cell), size)
+            self._set_object(x, y, Portal(x, y, self, rng.getrandbits(64)))
+
+        components = numpy.flatnonzero(choices == 3)[:GridRoom.COMPONENT_COUNT]
+        center = size // 2
+        for i in range(len(components)):
+            x = rng.randint(center-1,center+1)
+            y = rng.randint(center-1,center+1)
+            self._set_object(x, y, ShipComponent(x, y, rng))
+
+    def toggle_portal(self):
+        """ Changes to flashing or to normal depending on the current state of the portal
+        """
+        portal = self.linked_portal
+        if portal.get_image() == 'portal-flashing.ppm':
+            portal.change_to_normal()
+        else:
+            portal.change_to_flash()
+        self.tiles[portal.x, portal.y] = tile_id(portal.image, portal.kind)
+        self._changed(portal.x*self.size + portal.y)
+
+    def toggle_broken(self, item):
+        """ Calls the toggle_broken method on the item to change the item,
+        and shows its new image in the grid
+        """
+        item.toggle_broken()
+        self._set_object(item.x, item.y, item)
+
+    def _build_index(self):
+        """ Nothing to do; the tile grid is the index
+        """
+        pass
+
+    def _check_if_empty(self, x, y):
+        """ Check if there isn't an object at that point in the room
+
+            Args:
+                x: the x coord to check
+                y: the y coord to check
+            Returns:
+                True if space is empty. False otherwise
+        """
+        return self.tiles[x, y] == 0
+
+    def add_item(self, item, rng = None):
+        """ Adds item to a random empty cell
+
+            Args:
+                item: item being added to the room
+                rng: the random generator that picks the cell
+        """
+        if rng == None:
+            rng = random
+        if item.get_image() == 'portal.ppm':
+            self.linked_portal = item
+        empty = numpy.flatnonzero(self.tiles == 0)
+        item.x, item.y = divmod(int(empty[rng.randrange(len(empty))]), self.size)
+        self._set_object(item.x, item.y, item)
+
+    def get_object(self, x, y):
+        """ Returns the object at the specified x and y coords
+        """
+        tile = self.tiles[x, y]
+        if tile == 0:
+            return EMPTY
+        if TILE_KINDS[tile] == PORTAL_KIND:
+            for portal in self.portals:
+                if portal.x == x and portal.y == y:
+                    return portal
+        return _make_item(TILE_KINDS[tile], x, y, TILE_IMAGES[tile])
+
+    def _set_object(self, x, y, object):
+        if TILE_KINDS[self.tiles[x, y]] == PORTAL_KIND:
+            self.portals = [portal for portal in self.portals
+                            if portal.x != x or portal.y != y]
+        if object is EMPTY:
+            self.tiles[x, y] = 0
+        else:
+            self.tiles[x, y] = tile_id(object.image, object.kind)
+            if object.kind == PORTAL_KIND:
+                self.portals.append(object)
+        self._changed(x*self.size + y)
+        self.modified = True
+
+    def _initalize_room(self, size):
+        """ Initalizes room with empty tiles. Size dependent on given input.
+        """
+        return numpy.zeros((size, size), TILE_DTYPE)
+
+    def kinds(self):
+        """ Returns an array of the item kind of every cell, kinds[x, y]
+        """
+        return _kindArray[self.tiles]
+
+    def _cells(self, mask):
+        """ Returns the cells where mask is True as a list of (x, y) tuples,
+        like Room's queries
+        """
+        return list(map(tuple, numpy.argwhere(mask).tolist()))
+
+    def empty_cells(self):
+        """ Returns the empty cells
+
+            Returns:
+                List of (x, y) tuples
+        """
+        return self._cells(self.tiles == 0)
+
+    def cells_of_kind(self, kind):
+        """ Returns the cells holding items of the given kind
+
+            Args:
+                kind: one of the item kinds, e.g. PART_KIND
+            Returns:
+                List of (x, y) tuples
+        """
+        return self._cells(self.kinds() == kind)
+
+    def cells_of_image(self, image):
+        """ Returns the cells holding items that show the given image
+
+            Args:
+                image: the image name, e.g. 'enginebroken.ppm'
+            Returns:
+                List of (x, y) tuples
+        """
+        return self._cells(self.tiles == _tileIds.get(image, -1))
+
+    def nearest(self, x, y, kind = None, image = None):
+        """ Finds the item closest to x, y in rover steps (moving one cell
+        up, down, left or right at a time)
+
+            Args:
+                x: the x coord to measure from
+                y: the y coord to measure from
+                kind: only look at items of this kind
+                image: only look at items showing this image
+            Returns:
+                The nearest matching item, or None if there is none
+        """
+        if image != None:
+            cells = numpy.argwhere(self.tiles == _tileIds.get(image, -1))
+        elif kind != None:
+            cells = numpy.argwhere(self.kinds() == kind)
+        else:
+            cells = numpy.argwhere(self.tiles != 0)
+        if len(cells) == 0:
+            return None
+        steps = numpy.abs(cells - (x, y)).sum(axis=1)
+        best_x, best_y = cells[steps.argmin()]
+        return self.get_object(int(best_x), int(best_y))
+
+    def count_kinds(self):
+        """ Returns an array with the number of cells of each item kind,
+        indexed by kind
+        """
+        return numpy.bincount(self.kinds().ravel(),
+                              minlength=SHIP_COMPONENT_KIND + 1)
+
+    def image_grid(self):
+        """ Returns an object array of the image name of every cell,
+        images[x, y], with None for empty cells
+        """
+        return numpy.array(TILE_IMAGES, object)[self.tiles]
@@ -0,0 +1,807 @@
+# offscreen.py
+"""Offscreen drawing backend with the interface of graphics.py
+
+The classes here have the same names and methods as the ones in
+graphics.py that GameBoard uses (GraphWin, Point, Rectangle, Text,
+Image, Button), but nothing is shown on screen and Tk is never
+imported. A GraphWin keeps its objects in a display list and composites
+them into a NumPy RGB array when the pixels are asked for, so a whole
+board costs one slice assignment per image. Frames can be written out
+as PPM files:
+
+--------------------------------------------------------------------
+import offscreen
+from Game import Game
+
+game = Game(backend=offscreen)
+game.gui.updateGUI()
+game.gui.window.save("frame.ppm")
+--------------------------------------------------------------------
+
+Text and Button objects keep their state (getText, invoke) but are not
+painted, since there is no font renderer.
+
+REQUIRES: NumPy
+"""
+
+import numpy
+
+
+##########################################################################
+# Module Exceptions
+
+class GraphicsError(Exception):
+    """Generic error class for graphics module exceptions."""
+    pass
+
+OBJ_ALREADY_DRAWN = "Object currently drawn"
+UNSUPPORTED_METHOD = "Object doesn't support operation"
+BAD_OPTION = "Illegal option value"
+
+# Colors by name. Only the ones the game uses are listed; any color can
+# also be given as "#rrggbb" (see color_rgb).
+COLORS = {"white": (255, 255, 255),
+          "black": (0, 0, 0),
+          "gray": (190, 190, 190),
+          "grey": (190, 190, 190),
+          "lightgrey": (211, 211, 211),
+          "red": (255, 0, 0),
+          "green": (0, 255, 0),
+          "blue": (0, 0, 255),
+          "mediumblue": (0, 0, 205),
+          "tan": (210, 180, 140)}
+
+CANVAS_BACKGROUND = (217, 217, 217) # Tk's default canvas color
+
+def update():
+    pass
+
+def color_rgb(r,g,b):
+    """r,g,b are intensities of red, green, and blue in range(256)
+    Returns color specifier string for the resulting color"""
+    return "#%02x%02x%02x" % (r,g,b)
+
+def colorToRGB(color):
+    """Returns color (a name or "#rrggbb") as an (r,g,b) tuple, or None
+    for the empty (transparent) color"""
+    if color == "":
+        return None
+    if color.startswith("#") and len(color) == 7:
+        return (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+    try:
+        return COLORS[color.lower()]
+    except KeyError:
+        raise GraphicsError(BAD_OPTION)
+
+def _ppmToken(data, pos):
+    # Returns the next whitespace separated header token of a PPM file
+    # and the position after it, skipping # comments
+    while True:
+        while data[pos:pos+1].isspace():
+            pos = pos + 1
+        if data[pos:pos+1] != b"#":
+            break
+        pos = data.index(b"\n", pos)
+    end = pos
+    while not data[end:end+1].isspace():
+        end = end + 1
+    return data[pos:end], end
+
+def readPPM(filename):
+    """Reads a binary (P6) PPM file and returns its pixels as a
+    height x width x 3 array of uint8"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    magic, pos = _ppmToken(data, 0)
+    if magic != b"P6":
+        raise GraphicsError("not a binary PPM file: " + filename)
+    width, pos = _ppmToken(data, pos)
+    height, pos = _ppmToken(data, pos)
+    maxval, pos = _ppmToken(data, pos)
+    width, height, maxval = int(width), int(height), int(maxval)
+    pos = pos + 1 # single whitespace before the pixel data
+    if maxval < 256:
+        pixels = numpy.frombuffer(data, numpy.uint8, width*height*3, pos)
+    else: # two bytes per sample
+        pixels = numpy.frombuffer(data, ">u2", width*height*3, pos)
+    if maxval != 255:
+        pixels = (pixels.astype(numpy.uint32) * 255 // maxval).astype(numpy.uint8)
+    return pixels.reshape(height, width, 3)
+
+def ppmBytes(pixels):
+    """Returns a height x width x 3 array of uint8 as binary PPM data"""
+    height, width = pixels.shape[:2]
+    header = ("P6\n%d %d\n255\n" % (width, height)).encode("ascii")
+    return header + numpy.ascontiguousarray(pixels, numpy.uint8).tobytes()
+
+
+############################################################################
+# Graphics classes start here
+
+class GraphWin:
+
+    """A GraphWin is an offscreen window whose contents are an RGB array."""
+
+    def __init__(self, title="Graphics Window",
+                 width=200, height=200, autoflush=True):
+        self.title = title
+        self.height = height
+        self.width = width
+        self.autoflush = autoflush
+        self.background = CANVAS_BACKGROUND
+        self.trans = None
+        self.closed = False
+        self.displayList = {} # id -> object, bottom to top
+        self.nextId = 1
+        self.pixels = numpy.empty((height, width, 3), numpy.uint8)
+        self.stale = True         # the whole window needs compositing
+        self.damage = []          # rectangles that need compositing
+        self.clip = (0, 0, width, height) # painting is limited to this
+        self.updateCount = 0      # times the pixels were composited
+        self.frameDepth = 0       # nesting level of open frames
+        self.frameUpdates = 0     # composites done by the last frame
+        self.frameDeferred = 0    # changes batched by the last frame
+        self._deferred = 0
+        self._closeHandler = None
+        self._mouseCallback = None
+
+    def __checkOpen(self):
+        if self.closed:
+            raise GraphicsError("window is closed")
+
+    def setBackground(self, color):
+        """Set background color of the window"""
+        self.__checkOpen()
+        self.background = colorToRGB(color)
+        self._autoUpdate()
+
+    def setCoords(self, x1, y1, x2, y2):
+        """Set coordinates of window to run from (x1,y1) in the
+        lower-left corner to (x2,y2) in the upper-right corner."""
+        self.trans = Transform(self.width, self.height, x1, y1, x2, y2)
+
+    def close(self):
+        """Close the window"""
+        self.closed = True
+
+    def isClosed(self):
+        return self.closed
+
+    def isOpen(self):
+        return not self.closed
+
+    def _autoUpdate(self, *rects):
+        # Called after every change to the window with the screen
+        # rectangles the change touched (None for one that paints
+        # nothing); with no rectangles the whole window is redrawn.
+        # Compositing is left until the pixels are needed.
+        if rects:
+            for rect in rects:
+                if rect:
+                    self.damage.append(rect)
+        else:
+            self.stale = True
+        if self.frameDepth:
+            self._deferred = self._deferred + 1
+
+    def beginFrame(self):
+        """Start batching drawing calls (see endFrame)"""
+        if self.frameDepth == 0:
+            self._deferred = 0
+            self._frameStart = self.updateCount
+        self.frameDepth = self.frameDepth + 1
+
+    def endFrame(self):
+        """Finish a frame started by beginFrame. The outermost endFrame
+        composites the window once. Returns the number of composites the
+        frame did."""
+        if self.frameDepth == 0:
+            raise GraphicsError("endFrame without beginFrame")
+        self.frameDepth = self.frameDepth - 1
+        if self.frameDepth == 0:
+            if not self.closed:
+                self.flush()
+            self.frameUpdates = self.updateCount - self._frameStart
+            self.frameDeferred = self._deferred
+        return self.frameUpdates
+
+    def frame(self):
+        """Context manager for beginFrame/endFrame"""
+        return _Frame(self)
+
+    def flush(self):
+        """Composite everything drawn so far into the pixels. Only the
+        rectangles changed since the last flush are repainted."""
+        self.__checkOpen()
+        if self.stale:
+            self.pixels[:] = self.background
+            for item in list(self.displayList.values()):
+                item._render(self)
+        elif self.damage:
+            items = list(self.displayList.values())
+            bounds = numpy.array([item._bounds(self) or (0, 0, 0, 0)
+                                  for item in items]).reshape(-1, 4)
+            for rect in self._mergeDamage():
+                x1, y1, x2, y2 = rect
+                self.pixels[y1:y2, x1:x2] = self.background
+                self.clip = rect
+                hits = numpy.flatnonzero((bounds[:,0] < x2) & (bounds[:,2] > x1) &
+                                         (bounds[:,1] < y2) & (bounds[:,3] > y1))
+                for i in hits:
+                    items[i]._render(self)
+            self.clip = (0, 0, self.width, self.height)
+        else:
+            return
+        self.stale = False
+        self.damage = []
+        self.updateCount = self.updateCount + 1
+
+    def _mergeDamage(self):
+        # Returns the damaged rectangles clipped to the window, with
+        # overlapping or touching ones merged, so no pixel is painted twice
+        rects = []
+        for x1, y1, x2, y2 in self.damage:
+            rect = (max(x1, 0), max(y1, 0),
+                    min(x2, self.width), min(y2, self.height))
+            if rect[0] >= rect[2] or rect[1] >= rect[3]:
+                continue
+            merged = True
+            while merged:
+                merged = False
+                for other in rects:
+                    if (other[0] <= rect[2] and rect[0] <= other[2] and
+                        other[1] <= rect[3] and rect[1] <= other[3]):
+                        rects.remove(other)
+                        rect = (min(rect[0], other[0]), min(rect[1], other[1]),
+                                max(rect[2], other[2]), max(rect[3], other[3]))
+                        merged = True
+                        break
+            rects.append(rect)
+        return rects
+
+    def getPixels(self):
+        """Return the window contents as a height x width x 3 uint8 array"""
+        self.flush()
+        return self.pixels
+
+    def save(self, filename):
+        """Write the window contents to filename as a binary PPM"""
+        with open(filename, "wb") as f:
+            f.write(ppmBytes(self.getPixels()))
+
+    def getMouse(self):
+        raise GraphicsError("an offscreen window has no mouse")
+
+    def checkMouse(self):
+        return None
+
+    def mainloop(self):
+        raise GraphicsError("an offscreen window has no event loop")
+
+    def quit(self):
+        pass
+
+    def getHeight(self):
+        """Return the height of the window"""
+        return self.height
+
+    def getWidth(self):
+        """Return the width of the window"""
+        return self.width
+
+    def toScreen(self, x, y):
+        trans = self.trans
+        if trans:
+            return self.trans.screen(x,y)
+        else:
+            return x,y
+
+    def toWorld(self, x, y):
+        trans = self.trans
+        if trans:
+            return self.trans.world(x,y)
+        else:
+            return x,y
+
+    def setMouseHandler(self, func):
+        self._mouseCallback = func
+
+    def setCloseHandler(self, func):
+        self._closeHandler = func
+
+    def tag_raise(self, id):
+        """Move the object with the given id to the top of the display list"""
+        item = self.displayList.pop(id)
+        self.displayList[id] = item
+        self._autoUpdate(item._bounds(self))
+
+    def _add(self, item):
+        id = self.nextId
+        self.nextId = self.nextId + 1
+        self.displayList[id] = item
+        return id
+
+    def _remove(self, id):
+        del self.displayList[id]
+
+    def _fill(self, x1, y1, x2, y2, rgb):
+        # Paint the rectangle of pixels from (x1,y1) to (x2,y2) inclusive,
+        # clipped to the window
+        x1, x2 = sorted((int(x1), int(x2)))
+        y1, y2 = sorted((int(y1), int(y2)))
+        left, top, right, bottom = self.clip
+        x1 = max(x1, left)
+        y1 = max(y1, top)
+        x2 = min(x2 + 1, right)
+        y2 = min(y2 + 1, bottom)
+        if x1 < x2 and y1 < y2:
+            self.pixels[y1:y2, x1:x2] = rgb
+
+    def _blit(self, x, y, source, mask=None):
+        # Paint source with its top left corner at (x,y), clipped to the
+        # window. Where a mask is given only its True pixels are painted.
+        height, width = source.shape[:2]
+        left, top, right, bottom = self.clip
+        x1 = max(x, left)
+        y1 = max(y, top)
+        x2 = min(x + width, right)
+        y2 = min(y + height, bottom)
+        if x1 >= x2 or y1 >= y2:
+            return
+        part = source[y1-y:y2-y, x1-x:x2-x]
+        if mask is None:
+            self.pixels[y1:y2, x1:x2] = part
+        else:
+            keep = mask[y1-y:y2-y, x1-x:x2-x]
+            self.pixels[y1:y2, x1:x2][keep] = part[keep]
+
+
+class _Frame:
+    # Context manager returned by GraphWin.frame
+
+    def __init__(self, win):
+        self.win = win
+
+    def __enter__(self):
+        self.win.beginFrame()
+        return self.win
+
+    def __exit__(self, *exc):
+        self.win.endFrame()
+        return False
+
+
+class Transform:
+
+    """Internal class for 2-D coordinate transformations"""
+
+    def __init__(self, w, h, xlow, ylow, xhigh, yhigh):
+        # w, h are width and height of window
+        # (xlow,ylow) coordinates of lower-left [raw (0,h-1)]
+        # (xhigh,yhigh) coordinates of upper-right [raw (w-1,0)]
+        xspan = (xhigh-xlow)
+        yspan = (yhigh-ylow)
+        self.xbase = xlow
+        self.ybase = yhigh
+        self.xscale = xspan/float(w-1)
+        self.yscale = yspan/float(h-1)
+
+    def screen(self,x,y):
+        # Returns x,y in screen (actually window) coordinates
+        xs = (x-self.xbase) / self.xscale
+        ys = (self.ybase-y) / self.yscale
+        return int(xs+0.5),int(ys+0.5)
+
+    def world(self,xs,ys):
+        # Returns xs,ys in world coordinates
+        x = xs*self.xscale + self.xbase
+        y = self.ybase - ys*self.yscale
+        return x,y
+
+
+# Default values for various item configuration options. Only a subset of
+#   keys may be present in the configuration dictionary for a given item
+DEFAULT_CONFIG = {"fill":"",
+      "outline":"black",
+      "width":"1",
+      "arrow":"none",
+      "text":"",
+      "justify":"left",
+      "font": ("helvetica", 12, "normal"),
+      "anchor": "nw"} # n, ne, e, se, s, sw, w, nw, or center
+
+class GraphicsObject:
+
+    """Generic base class for all of the drawable objects"""
+    # A subclass of GraphicsObject should override _render and _move.
+
+    def __init__(self, options):
+        self.canvas = None
+        self.id = None
+        config = {}
+        for option in options:
+            config[option] = DEFAULT_CONFIG[option]
+        self.config = config
+
+    def setFill(self, color):
+        """Set interior color to color"""
+        self._reconfig("fill", color)
+
+    def setOutline(self, color):
+        """Set outline color to color"""
+        self._reconfig("outline", color)
+
+    def setWidth(self, width):
+        """Set line weight to width"""
+        self._reconfig("width", width)
+
+    def draw(self, graphwin):
+        """Draw the object in graphwin. Raises an error if the object is
+        already drawn."""
+        if self.canvas and not self.canvas.isClosed(): raise GraphicsError(OBJ_ALREADY_DRAWN)
+        if graphwin.isClosed(): raise GraphicsError("Can't draw to closed window")
+        self.canvas = graphwin
+        self.id = graphwin._add(self)
+        graphwin._autoUpdate(self._bounds(graphwin))
+
+    def undraw(self):
+        """Undraw the object. Returns silently if the object is not
+        currently drawn."""
+        if not self.canvas: return
+        if not self.canvas.isClosed():
+            self.canvas._remove(self.id)
+            self.canvas._autoUpdate(self._bounds(self.canvas))
+        self.canvas = None
+        self.id = None
+
+    def move(self, dx, dy):
+        """move object dx units in x direction and dy units in y
+        direction"""
+        if self.canvas and not self.canvas.isClosed():
+            old = self._bounds(self.canvas)
+            self._move(dx,dy)
+            self.canvas._autoUpdate(old, self._bounds(self.canvas))
+        else:
+            self._move(dx,dy)
+
+    def _reconfig(self, option, setting):
+        # Raises an error if the option does not exist in the config
+        #    dictionary for this object
+        if option not in self.config:
+            raise GraphicsError(UNSUPPORTED_METHOD)
+        self.config[option] = setting
+        if self.canvas and not self.canvas.isClosed():
+            self.canvas._autoUpdate(self._bounds(self.canvas))
+
+    def _render(self, win):
+        """paints the object into win.pixels"""
+        pass # override in subclass
+
+    def _bounds(self, win):
+        """returns the screen rectangle (x1, y1, x2, y2) the object paints,
+        x2 and y2 exclusive, or None if it paints nothing"""
+        return None # override in subclass that paints
+
+    def _move(self, dx, dy):
+        """updates internal state of object to move it dx,dy units"""
+        pass # must override in subclass
+
+
+class Point(GraphicsObject):
+    def __init__(self, x, y):
+        GraphicsObject.__init__(self, ["outline", "fill"])
+        self.setFill = self.setOutline
+        self.x = x
+        self.y = y
+
+    def _render(self, win):
+        x,y = win.toScreen(self.x,self.y)
+        win._fill(x, y, x, y, colorToRGB(self.config["outline"]))
+
+    def _bounds(self, win):
+        x,y = win.toScreen(self.x,self.y)
+        return (int(x), int(y), int(x) + 1, int(y) + 1)
+
+    def _move(self, dx, dy):
+        self.x = self.x + dx
+        self.y = self.y + dy
+
+    def clone(self):
+        other = Point(self.x,self.y)
+        other.config = self.config.copy()
+        return other
+
+    def getX(self): return self.x
+    def getY(self): return self.y
+
+class Rectangle(GraphicsObject):
+
+    def __init__(self, p1, p2):
+        GraphicsObject.__init__(self, ["outline","width","fill"])
+        self.p1 = p1.clone()
+        self.p2 = p2.clone()
+
+    def _render(self, win):
+        x1,y1 = win.toScreen(self.p1.x,self.p1.y)
+        x2,y2 = win.toScreen(self.p2.x,self.p2.y)
+        fill = colorToRGB(self.config["fill"])
+        if fill is not None:
+            win._fill(x1, y1, x2, y2, fill)
+        outline = colorToRGB(self.config["outline"])
+        if outline is not None:
+            win._fill(x1, y1, x2, y1, outline)
+            win._fill(x1, y2, x2, y2, outline)
+            win._fill(x1, y1, x1, y2, outline)
+            win._fill(x2, y1, x2, y2, outline)
+
+    def _bounds(self, win):
+        x1,y1 = win.toScreen(self.p1.x,self.p1.y)
+        x2,y2 = win.toScreen(self.p2.x,self.p2.y)
+        x1, x2 = sorted((int(x1), int(x2)))
+        y1, y2 = sorted((int(y1), int(y2)))
+        return (x1, y1, x2 + 1, y2 + 1)
+
+    def _move(self, dx, dy):
+        self.p1.x = self.p1.x + dx
+        self.p1.y = self.p1.y + dy
+        self.p2.x = self.p2.x + dx
+        self.p2.y = self.p2.y  + dy
+
+    def getP1(self): return self.p1.clone()
+
+    def getP2(self): return self.p2.clone()
+
+    def getCenter(self):
+        p1 = self.p1
+        p2 = self.p2
+        return Point((p1.x+p2.x)/2.0, (p1.y+p2.y)/2.0)
+
+    def clone(self):
+        other = Rectangle(self.p1, self.p2)
+        other.config = self.config.copy()
+        return other
+
+class Text(GraphicsObject):
+
+    def __init__(self, p, text):
+        GraphicsObject.__init__(self, ["justify","fill","text","font", "anchor"])
+        self.setText(text)
+        self.anchor = p.clone()
+        self.setFill(DEFAULT_CONFIG['outline'])
+        self.setOutline = self.setFill
+
+    def _move(self, dx, dy):
+        self.anchor.move(dx,dy)
+
+    def clone(self):
+        other = Text(self.anchor, self.config['text'])
+        other.config = self.config.copy()
+        return other
+
+    def setText(self,text):
+        self._reconfig("text", text)
+
+    def getText(self):
+        return self.config["text"]
+
+    def getAnchor(self):
+        return self.anchor.clone()
+
+    def setFace(self, face):
+        if face in ['helvetica','arial','courier','times roman']:
+            f,s,b = self.config['font']
+            self._reconfig("font",(face,s,b))
+        else:
+            raise GraphicsError(BAD_OPTION)
+
+    def setSize(self, size):
+        if 5 <= size <= 36:
+            f,s,b = self.config['font']
+            self._reconfig("font", (f,size,b))
+        else:
+            raise GraphicsError(BAD_OPTION)
+
+    def setStyle(self, style):
+        if style in ['bold','normal','italic', 'bold italic']:
+            f,s,b = self.config['font']
+            self._reconfig("font", (f,s,style))
+        else:
+            raise GraphicsError(BAD_OPTION)
+
+    def setTextColor(self, color):
+        self.setFill(color)
+
+class Button(GraphicsObject):
+    def __init__(self, p, text, fncn, bkcolor='LightGrey'):
+        GraphicsObject.__init__(self, [])
+        self.anchor = p.clone()
+        self.text = text
+        self.fncn = fncn
+        self.bkcolor = bkcolor
+
+    def invoke(self):
+        """Call the button's function as if it had been clicked"""
+        return self.fncn()
+
+class ImageCache:
+
+    """Bounded cache of decoded PPM pixels keyed by file name.
+
+    Works like graphics.ImageCache. The cached arrays are read only;
+    Images copy them before changing a pixel. Names found in a loaded
+    atlas are views of the atlas array, so all of them share one buffer."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.photos = {} # file name -> pixels, oldest use first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.atlas = None       # decoded atlas pixels
+        self.atlasIndex = {}    # file name -> (x, y, width, height) in atlas
+        self.atlasFile = None
+
+    def get(self, filename):
+        """Return the decoded pixels for filename"""
+        pixels = self.photos.pop(filename, None)
+        if pixels is None:
+            self.misses = self.misses + 1
+            rect = self.atlasIndex.get(filename)
+            if rect:
+                x, y, width, height = rect
+                pixels = self.atlas[y:y+height, x:x+width]
+            else:
+                pixels = readPPM(filename)
+            pixels.flags.writeable = False
+            while len(self.photos) >= self.capacity:
+                del self.photos[next(iter(self.photos))]
+                self.evictions = self.evictions + 1
+        else:
+            self.hits = self.hits + 1
+        self.photos[filename] = pixels # re-insert as most recently used
+        return pixels
+
+    def loadAtlas(self, filename, index):
+        """Decode the atlas image filename. index maps file names to
+        their (x, y, width, height) rectangle in the atlas."""
+        if filename == self.atlasFile and index == self.atlasIndex:
+            return # already loaded
+        self.atlas = readPPM(filename)
+        self.atlas.flags.writeable = False
+        self.atlasIndex = dict(index)
+        self.atlasFile = filename
+        self.invalidate()
+
+    def invalidate(self, filename=None):
+        """Forget the cached pixels for filename (all of them if None)"""
+        if filename is None:
+            self.photos.clear()
+        else:
+            self.photos.pop(filename, None)
+
+    def stats(self):
+        """Return a dictionary of the cache counters"""
+        return {"size": len(self.photos), "capacity": self.capacity,
+                "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions}
+
+class Image(GraphicsObject):
+
+    idCount = 0
+    photoCache = ImageCache() # decoded pixels shared by file name
+
+    def __init__(self, p, *pixmap):
+        GraphicsObject.__init__(self, [])
+        self.anchor = p.clone()
+        self.imageId = Image.idCount
+        Image.idCount = Image.idCount + 1
+        self._setPixels(pixmap)
+
+    def setImage(self, *pixmap):
+        if self.canvas and not self.canvas.isClosed():
+            old = self._bounds(self.canvas)
+            self._setPixels(pixmap)
+            self.canvas._autoUpdate(old, self._bounds(self.canvas))
+        else:
+            self._setPixels(pixmap)
+
+    def _setPixels(self, pixmap):
+        if len(pixmap) == 1: # file name provided
+            self.imageName = pixmap[0]
+            self.img = Image.photoCache.get(pixmap[0])
+            self.mask = None
+        else: # width and height provided: a blank, transparent image
+            self.imageName = None
+            width, height = pixmap
+            self.img = numpy.zeros((height, width, 3), numpy.uint8)
+            self.mask = numpy.zeros((height, width), bool)
+
+    def getImage(self):
+       return self.imageName
+
+    def putArray(self, pixels):
+        """Show pixels, a height x width x 3 array of uint8. The array is
+        used as it is, so later changes to it show on the next frame."""
+        if self.canvas and not self.canvas.isClosed():
+            old = self._bounds(self.canvas)
+            self.img = pixels
+            self.mask = None
+            self.canvas._autoUpdate(old, self._bounds(self.canvas))
+        else:
+            self.img = pixels
+            self.mask = None
+
+    def _render(self, win):
+        x,y = win.toScreen(self.anchor.x,self.anchor.y)
+        height, width = self.img.shape[:2]
+        # drawn centered on the anchor, like a Tk canvas image
+        win._blit(int(x) - width//2, int(y) - height//2, self.img, self.mask)
+
+    def _bounds(self, win):
+        x,y = win.toScreen(self.anchor.x,self.anchor.y)
+        height, width = self.img.shape[:2]
+        x1 = int(x) - width//2
+        y1 = int(y) - height//2
+        return (x1, y1, x1 + width, y1 + height)
+
+    def _move(self, dx, dy):
+        self.anchor.move(dx,dy)
+
+    def getAnchor(self):
+        return self.anchor.clone()
+
+    def clone(self):
+        other = Image(Point(0,0), 0, 0)
+        other.img = self.img.copy()
+        if self.mask is not None:
+            other.mask = self.mask.copy()
+        else:
+            other.mask = None
+        other.anchor = self.anchor.clone()
+        other.config = self.config.copy()
+        return other
+
+    def getWidth(self):
+        """Returns the width of the image in pixels"""
+        return self.img.shape[1]
+
+    def getHeight(self):
+        """Returns the height of the image in pixels"""
+        return self.img.shape[0]
+
+    def getPixel(self, x, y):
+        """Returns a list [r,g,b] with the RGB color values for pixel (x,y)
+        r,g,b are in range(256)
+
+        """
+        return [int(c) for c in self.img[y, x]]
+
+    def setPixel(self, x, y, color):
+        """Sets pixel (x,y) to the given color
+
+        """
+        if not self.img.flags.writeable: # copy on write, the cache is shared
+            self.img = self.img.copy()
+        self.img[y, x] = colorToRGB(color)
+        if self.mask is not None:
+            self.mask[y, x] = True
+        if self.canvas and not self.canvas.isClosed():
+            self.canvas._autoUpdate(self._bounds(self.canvas))
+
+    def save(self, filename):
+        """Saves the image to filename as a binary PPM"""
+        with open(filename, "wb") as f:
+            f.write(ppmBytes(self.img))
+
+def imageCacheStats():
+    """Return the hit, miss and eviction counters of the shared image cache"""
+    return Image.photoCache.stats()
+
+def invalidateImageCache(filename=None):
+    """Drop filename (or every file if None) from the shared image cache"""
+    Image.photoCache.invalidate(filename)
+
+def loadAtlas(filename, index):
+    """Draw Images whose file name is in index (name -> (x, y, width,
+    height)) from that rectangle of the atlas image filename"""
+    Image.photoCache.loadAtlas(filename, index)